@@ -0,0 +1,130 @@
+# Local stand-in for the Elasticsearch _bulk API.
+#
+# Accepts plain or gzipped bulk bodies, counts documents per index and can
+# inject failures, so the generator's elasticsearch sink can be exercised
+# without a cluster:
+#
+#   python bulk_standin.py --port 9201 --item-429-rate 0.05 &
+#   ELASTICSEARCH_URL=http://localhost:9201 python generator.py load --sink elasticsearch --duration 10
+#
+# GET /_stats/docs returns the counts so far; totals are also printed on exit.
+import argparse
+import collections
+import gzip
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class BulkStandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, item_429_rate=0.0, item_400_rate=0.0, request_503_rate=0.0):
+        super().__init__(address, BulkHandler)
+        self.item_429_rate = item_429_rate
+        self.item_400_rate = item_400_rate
+        self.request_503_rate = request_503_rate
+        self.lock = threading.Lock()
+        self.docs = collections.Counter()
+        self.requests = 0
+        self.retried_items = 0
+        self.rejected_items = 0
+        self.failed_requests = 0
+        self.bytes_received = 0
+
+
+class BulkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like Elasticsearch
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server.lock:
+            stats = {
+                'indices': dict(self.server.docs),
+                'total': sum(self.server.docs.values()),
+                'requests': self.server.requests,
+                'failed_requests': self.server.failed_requests,
+                'retried_items': self.server.retried_items,
+                'rejected_items': self.server.rejected_items,
+                'bytes_received': self.server.bytes_received,
+            }
+        self.reply(200, stats)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        if not self.path.split('?')[0].endswith('/_bulk'):
+            return self.reply(404, {'error': 'only _bulk is supported'})
+        if random.random() < server.request_503_rate:
+            with server.lock:
+                server.failed_requests += 1
+            return self.reply(503, {'error': 'unavailable_shards_exception', 'status': 503})
+        raw_size = len(body)
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        lines = body.splitlines()
+        items, indexed = [], collections.Counter()
+        retried = rejected = 0
+        for action_line, doc_line in zip(lines[::2], lines[1::2]):
+            action, meta = next(iter(json.loads(action_line).items()))
+            json.loads(doc_line)
+            roll = random.random()
+            if roll < server.item_429_rate:
+                retried += 1
+                items.append({action: {'_index': meta['_index'], 'status': 429,
+                                       'error': {'type': 'es_rejected_execution_exception',
+                                                 'reason': 'rejected execution'}}})
+            elif roll < server.item_429_rate + server.item_400_rate:
+                rejected += 1
+                items.append({action: {'_index': meta['_index'], 'status': 400,
+                                       'error': {'type': 'mapper_parsing_exception',
+                                                 'reason': 'failed to parse'}}})
+            else:
+                indexed[meta['_index']] += 1
+                items.append({action: {'_index': meta['_index'], 'status': 201, 'result': 'created'}})
+        with server.lock:
+            server.requests += 1
+            server.docs.update(indexed)
+            server.retried_items += retried
+            server.rejected_items += rejected
+            server.bytes_received += raw_size
+        self.reply(200, {'took': 1, 'errors': bool(retried or rejected), 'items': items})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stand-in for the Elasticsearch _bulk API.')
+    parser.add_argument('--port', type=int, default=9201)
+    parser.add_argument('--item-429-rate', type=float, default=0.0,
+                        help='fraction of items answered 429, which the sink retries')
+    parser.add_argument('--item-400-rate', type=float, default=0.0,
+                        help='fraction of items answered 400, which the sink drops as rejected')
+    parser.add_argument('--request-503-rate', type=float, default=0.0,
+                        help='fraction of whole bulk requests answered 503')
+    args = parser.parse_args(argv)
+    server = BulkStandIn(('0.0.0.0', args.port), args.item_429_rate, args.item_400_rate,
+                         args.request_503_rate)
+    print(f"Bulk stand-in listening on :{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps({'indices': dict(server.docs), 'total': sum(server.docs.values()),
+                          'requests': server.requests, 'failed_requests': server.failed_requests,
+                          'retried_items': server.retried_items,
+                          'rejected_items': server.rejected_items}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,29 +3,640 @@ import json
 import time
 import random
 import os
+import argparse
+import base64
+import bisect
+import collections
+import datetime
+import gzip
+import http.client
+import math
+import multiprocessing
+import queue
+import select
+import signal
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
+try:
+    import numpy as np
+except ImportError:  # optional: batch synthesis falls back to the random module
+    np = None
+
+SINK = os.environ.get('SINK', 'logstash')
 LOGSTASH_HOST = os.environ.get('LOGSTASH_HOST', 'localhost')
 LOGSTASH_PORT = int(os.environ.get('LOGSTASH_PORT', 5000))
 
+# Elasticsearch sink: _bulk straight into the index Logstash would write to
+ELASTICSEARCH_URL = os.environ.get('ELASTICSEARCH_URL', 'http://localhost:9200')
+ES_INDEX = os.environ.get('ES_INDEX', 'logs-%Y.%m.%d')
+ES_BULK_GZIP = os.environ.get('ES_BULK_GZIP', 'true').lower() in ('1', 'true', 'yes')
+ES_CONCURRENCY = int(os.environ.get('ES_CONCURRENCY', 4))
+ES_TIMEOUT = float(os.environ.get('ES_TIMEOUT', 30.0))
+
+# Shipping: events are buffered and sent to the sink in batches
+BATCH_SIZE = int(os.environ.get('BATCH_SIZE', 500))
+FLUSH_INTERVAL = float(os.environ.get('FLUSH_INTERVAL', 1.0))
+MAX_BUFFERED = int(os.environ.get('MAX_BUFFERED', 10000))
+CONNECT_TIMEOUT = float(os.environ.get('CONNECT_TIMEOUT', 5.0))
+RECONNECT_BACKOFF_MIN = float(os.environ.get('RECONNECT_BACKOFF_MIN', 0.1))
+RECONNECT_BACKOFF_MAX = float(os.environ.get('RECONNECT_BACKOFF_MAX', 30.0))
+SHUTDOWN_TIMEOUT = float(os.environ.get('SHUTDOWN_TIMEOUT', 10.0))
+
+# Self-metrics in the Prometheus text format on METRICS_PORT; 0 turns them off
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 0))
+SEND_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Spool: events the sink can't take yet overflow to disk when SPOOL_DIR is set
+SPOOL_DIR = os.environ.get('SPOOL_DIR')
+SPOOL_MAX_BYTES = int(os.environ.get('SPOOL_MAX_BYTES', 256 * 1024 * 1024))
+SPOOL_SEGMENT_BYTES = int(os.environ.get('SPOOL_SEGMENT_BYTES', 16 * 1024 * 1024))
+SPOOL_FSYNC_INTERVAL = float(os.environ.get('SPOOL_FSYNC_INTERVAL', 1.0))
+SPOOL_DROP_POLICY = os.environ.get('SPOOL_DROP_POLICY', 'oldest')
+
 log_levels = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+level_weights = [10, 50, 20, 15, 5]
 endpoints = ['/api/users', '/api/products', '/api/orders', '/health', '/']
 methods = ['GET', 'POST', 'PUT', 'DELETE']
+status_codes = [200, 201, 400, 404, 500]
+status_weights = [70, 10, 10, 5, 5]
+response_times = range(10, 501)
+
+
+class DiskSpool:
+    """Bounded on-disk FIFO of JSON lines for events the sink can't take yet.
+
+    Lines are appended to numbered segment files and read back from the
+    oldest one. A segment is deleted once everything in it has been
+    delivered. The read position is saved to a cursor file after each
+    delivered batch, so a restart resumes where the last run stopped.
+    Delivery is at least once: a batch sent just before a crash may be sent
+    again. Appends are fsynced at most every fsync_interval seconds. When
+    max_bytes is reached, the drop policy either discards the oldest
+    segment ('oldest') or rejects the new event ('newest').
+
+    Not thread-safe; Shipper calls it with its condition lock held.
+    """
+
+    FIRST_SEGMENT = 10 ** 12  # leaves room below for segments added by prepend()
+
+    def __init__(self, path, max_bytes=SPOOL_MAX_BYTES, segment_bytes=SPOOL_SEGMENT_BYTES,
+                 fsync_interval=SPOOL_FSYNC_INTERVAL, policy=SPOOL_DROP_POLICY):
+        if policy not in ('oldest', 'newest'):
+            raise ValueError(f"unknown spool drop policy {policy!r}")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segment_bytes = min(segment_bytes, max_bytes)
+        self.fsync_interval = fsync_interval
+        self.policy = policy
+        self.spooled = 0
+        self.unspooled = 0
+        self.dropped = 0
+        os.makedirs(path, exist_ok=True)
+        self._sizes = {}
+        for name in os.listdir(path):
+            if name.endswith('.seg'):
+                self._sizes[int(name[:-4])] = os.path.getsize(os.path.join(path, name))
+        self._segments = collections.deque(sorted(self._sizes))
+        # Delivered bytes per partly read segment; others start from 0
+        self._offsets = {}
+        try:
+            with open(os.path.join(path, 'cursor')) as f:
+                offsets = json.load(f)
+            self._offsets = {int(seq): offset for seq, offset in offsets.items()
+                             if int(seq) in self._sizes}
+        except (OSError, ValueError, AttributeError):
+            pass
+        self.recovered = sum(self._count_lines(seq) for seq in self._segments)
+        # Always write to a fresh segment so a torn tail is never appended to
+        self._write_seq = (self._segments[-1] + 1) if self._segments else self.FIRST_SEGMENT
+        self._writer = None
+        self._synced_at = time.monotonic()
+        self._in_flight = None  # (segment, offset after the batch, lines) handed to read()
+
+    @property
+    def bytes(self):
+        return sum(self._sizes.values())
+
+    @property
+    def pending(self):
+        if not self._segments:
+            return False
+        head = self._segments[0]
+        return len(self._segments) > 1 or self._offsets.get(head, 0) < self._sizes[head]
+
+    def append(self, line):
+        """Spool one line; returns False if the drop policy rejected it."""
+        while self.bytes + len(line) > self.max_bytes:
+            if self.policy == 'newest' or not self._drop_oldest():
+                self.dropped += 1
+                return False
+        if self._writer is None or self._sizes[self._write_seq] >= self.segment_bytes:
+            self._roll()
+        self._writer.write(line)
+        self._sizes[self._write_seq] += len(line)
+        self.spooled += 1
+        if time.monotonic() - self._synced_at >= self.fsync_interval:
+            self._sync()
+        return True
+
+    def prepend(self, lines):
+        """Spool lines ahead of everything else, e.g. a buffer left at shutdown."""
+        if not lines:
+            return
+        seq = (self._segments[0] if self._segments else self._write_seq) - 1
+        data = b''.join(lines)
+        with open(os.path.join(self.path, f'{seq:020d}.seg'), 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._segments.appendleft(seq)
+        self._sizes[seq] = len(data)
+        self.spooled += len(lines)
+
+    def read(self, max_lines):
+        """Return up to max_lines from the head without consuming them."""
+        while self._segments:
+            seq = self._segments[0]
+            if seq == self._write_seq and self._writer is not None:
+                self._writer.flush()
+            lines, offset = [], self._offsets.get(seq, 0)
+            with open(self._segment_path(seq), 'rb') as f:
+                f.seek(offset)
+                while len(lines) < max_lines:
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        break  # end of data, or a torn write from a crash
+                    lines.append(line)
+                    offset += len(line)
+            if lines:
+                self._in_flight = (seq, offset, len(lines))
+                return lines
+            if seq == self._write_seq:
+                return []
+            # A finished segment with a torn tail: drop the partial line
+            self._remove_head()
+        return []
+
+    def commit(self):
+        """Consume the lines returned by the last read()."""
+        if self._in_flight is None:
+            return
+        seq, offset, count = self._in_flight
+        self._in_flight = None
+        if not self._segments or self._segments[0] != seq:
+            return  # the segment was dropped while the batch was in flight
+        self._offsets[seq] = offset
+        self.unspooled += count
+        if offset < self._sizes[seq]:
+            self._save_cursor()
+            return
+        if seq == self._write_seq and self._writer is not None:
+            # Drained: start the next spill in a new segment so this one can go
+            self._writer.close()
+            self._writer = None
+            self._write_seq += 1
+        self._remove_head()
+
+    def close(self):
+        if self._writer is not None:
+            self._sync()
+            self._writer.close()
+            self._writer = None
+        self._save_cursor()
+
+    def _segment_path(self, seq):
+        return os.path.join(self.path, f'{seq:020d}.seg')
+
+    def _roll(self):
+        if self._writer is not None:
+            self._sync()
+            self._writer.close()
+            self._write_seq += 1
+        self._writer = open(self._segment_path(self._write_seq), 'ab')
+        self._sizes[self._write_seq] = 0
+        self._segments.append(self._write_seq)
+
+    def _sync(self):
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._synced_at = time.monotonic()
+
+    def _drop_oldest(self):
+        if self._segments and self._segments[0] == self._write_seq:
+            if not self._sizes[self._write_seq]:
+                return False  # nothing left to drop
+            self._roll()
+        self.dropped += self._count_lines(self._segments[0])
+        self._remove_head()
+        return True
+
+    def _count_lines(self, seq):
+        count = 0
+        offset = self._offsets.get(seq, 0)
+        with open(self._segment_path(seq), 'rb') as f:
+            f.seek(offset)
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                count += chunk.count(b'\n')
+        return count
+
+    def _remove_head(self):
+        seq = self._segments.popleft()
+        del self._sizes[seq]
+        self._offsets.pop(seq, None)
+        os.remove(self._segment_path(seq))
+        self._save_cursor()
+
+    def _save_cursor(self):
+        tmp = os.path.join(self.path, 'cursor.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self._offsets, f)
+        os.replace(tmp, os.path.join(self.path, 'cursor'))
+
+
+class Histogram:
+    """Prometheus-style histogram whose snapshots can be summed across processes."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {'counts': list(self.counts), 'sum': self.sum}
+
+
+class Shipper:
+    """Buffers JSON lines and delivers them in batches from background threads.
+
+    send() only encodes and buffers the event. A worker thread takes a batch
+    once the buffer holds batch_size events or the oldest event has waited
+    flush_interval seconds. A batch that fails to send is retried with
+    exponential backoff. send() blocks while max_buffered events are waiting
+    or in flight, so a long outage applies backpressure instead of dropping
+    events.
+
+    With a DiskSpool, a full buffer overflows to disk instead of blocking.
+    While the spool holds anything, new events go behind it, and it is
+    drained once the buffer is empty. With one worker, order is kept.
+
+    Subclasses implement _send() for a particular sink.
+    """
+
+    target = None
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_buffered=MAX_BUFFERED, backoff_min=RECONNECT_BACKOFF_MIN,
+                 backoff_max=RECONNECT_BACKOFF_MAX, spool=None, workers=1):
+        self.spool = spool
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffered = max(self.batch_size, max_buffered)
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self._buffer = collections.deque()
+        self._oldest = None  # monotonic time the oldest buffered event arrived
+        self._in_flight = 0
+        self._spool_busy = False  # the spool hands out one batch at a time
+        self._unsent = []  # batches abandoned at shutdown, oldest first
+        self._cond = threading.Condition()
+        self._closing = False
+        self._abandon = False
+        # Counters read by the load-mode reporter
+        self.events_sent = 0
+        self.events_rejected = 0
+        self.bytes_sent = 0
+        self.send_errors = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.send_latency = Histogram(SEND_LATENCY_BUCKETS)
+        self._latencies = collections.deque(maxlen=100000)
+        self._threads = [
+            threading.Thread(target=self._run, name=f'{type(self).__name__}-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def send(self, event):
+        self.send_lines([(json.dumps(event) + '\n').encode()])
+
+    def send_lines(self, lines):
+        # Buffer already encoded JSON lines, e.g. from LogSynthesizer.lines()
+        with self._cond:
+            if self._closing:
+                raise RuntimeError('shipper is closed')
+            for line in lines:
+                if self.spool is not None and (self.spool.pending or self.buffered >= self.max_buffered):
+                    self.spool.append(line)
+                    continue
+                while self.buffered >= self.max_buffered and not self._closing:
+                    self._cond.notify_all()
+                    self._cond.wait()
+                if self._closing:
+                    raise RuntimeError('shipper is closed')
+                if not self._buffer:
+                    # Wakes a worker to start the flush_interval clock
+                    self._oldest = time.monotonic()
+                    self._cond.notify_all()
+                self._buffer.append(line)
+            if len(self._buffer) >= self.batch_size or self.spool is not None:
+                self._cond.notify_all()
+
+    @property
+    def buffered(self):
+        return len(self._buffer) + self._in_flight
+
+    def take_latencies(self):
+        # Seconds each batch write took since the last call
+        with self._cond:
+            latencies = list(self._latencies)
+            self._latencies.clear()
+        return latencies
+
+    def stats(self):
+        """Snapshot of the counters, for the load-mode reporter and /metrics."""
+        spool = self.spool
+        with self._cond:
+            return {
+                'sent': self.events_sent,
+                'rejected': self.events_rejected,
+                'bytes': self.bytes_sent,
+                'errors': self.send_errors,
+                'buffered': self.buffered,
+                'recovered': spool.recovered if spool else 0,
+                'spooled': spool.spooled if spool else 0,
+                'unspooled': spool.unspooled if spool else 0,
+                'dropped': spool.dropped if spool else 0,
+                'spool_bytes': spool.bytes if spool else 0,
+                'batch_size': self.batch_sizes.snapshot(),
+                'send_latency': self.send_latency.snapshot(),
+            }
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        # Flush what is buffered, giving up on an unreachable sink after timeout
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        if any(thread.is_alive() for thread in self._threads):
+            self._abandon = True
+            for thread in self._threads:
+                thread.join(self.backoff_max)
+        with self._cond:
+            unsent = [line for batch in self._unsent for line in batch] + list(self._buffer)
+            self._unsent = []
+            self._buffer.clear()
+            if self.spool is not None:
+                # Keep what the sink never got for the next run, ahead of the spool
+                self.spool.prepend(unsent)
+                self.spool.close()
+                unsent = []
+        return len(unsent)
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if self._abandon:
+                    return None
+                if len(self._buffer) >= self.batch_size or (self._closing and self._buffer):
+                    break
+                if self._closing:
+                    return None  # the spool, if any, is left for the next run
+                if (not self._buffer and self.spool is not None and self.spool.pending
+                        and not self._spool_busy):
+                    lines = self.spool.read(self.batch_size)
+                    if lines:
+                        self._spool_busy = True
+                        return lines, True
+                if self._buffer:
+                    remaining = self._oldest + self.flush_interval - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+            count = min(self.batch_size, len(self._buffer))
+            lines = [self._buffer.popleft() for _ in range(count)]
+            # In flight events still count against max_buffered until delivered
+            self._in_flight += count
+            self._oldest = time.monotonic() if self._buffer else None
+            return lines, False
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            lines, from_spool = batch
+            delivered = self._deliver(lines)
+            with self._cond:
+                if from_spool:
+                    self._spool_busy = False
+                    if delivered:
+                        self.spool.commit()
+                else:
+                    self._in_flight -= len(lines)
+                    if not delivered:
+                        self._unsent.append(lines)
+                self._cond.notify_all()
+            if not delivered:
+                return
+
+    def _deliver(self, lines):
+        backoff = self.backoff_min
+        while not self._abandon:
+            try:
+                started = time.perf_counter()
+                retry = self._send(lines)
+                elapsed = time.perf_counter() - started
+                with self._cond:
+                    self._latencies.append(elapsed)
+                    self.send_latency.observe(elapsed)
+                    self.batch_sizes.observe(len(lines))
+                    self.events_sent += len(lines) - len(retry)
+                if not retry:
+                    return True
+                # Partial failure: only the events the sink pushed back are resent
+                print(f"{self.target} pushed back {len(retry)} of {len(lines)} logs; "
+                      f"retrying them in {backoff:.1f}s")
+                lines = retry
+            except OSError as e:
+                with self._cond:
+                    self.send_errors += 1
+                    self.batch_sizes.observe(len(lines))
+                print(f"Failed to send {len(lines)} logs to {self.target}: {e}; "
+                      f"retrying in {backoff:.1f}s")
+            # Jitter keeps restarted generators from reconnecting in lockstep
+            time.sleep(random.uniform(backoff / 2, backoff))
+            backoff = min(backoff * 2, self.backoff_max)
+        return False
+
+    def _send(self, lines):
+        """Send one batch; return the lines to retry or raise OSError."""
+        raise NotImplementedError
+
+
+class TCPShipper(Shipper):
+    """Ships JSON lines to Logstash over a single long-lived connection."""
+
+    def __init__(self, host, port, connect_timeout=CONNECT_TIMEOUT, **kwargs):
+        self.host = host
+        self.port = port
+        self.target = f'{host}:{port}'
+        self.connect_timeout = connect_timeout
+        self._sock = None
+        # One connection: a single worker keeps events in order
+        super().__init__(workers=1, **kwargs)
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        pending = super().close(timeout)
+        self._disconnect()
+        return pending
+
+    def _send(self, lines):
+        payload = b''.join(lines)
+        try:
+            self._connection().sendall(payload)
+        except OSError:
+            self._disconnect()
+            raise
+        with self._cond:
+            self.bytes_sent += len(payload)
+        return []
+
+    def _connection(self):
+        if self._sock is not None and self._peer_closed(self._sock):
+            self._disconnect()
+        if self._sock is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            self._sock = sock
+        return self._sock
+
+    @staticmethod
+    def _peer_closed(sock):
+        # Logstash never writes to us, so a readable socket means EOF or a
+        # reset. Checking first stops a batch vanishing into a dead connection.
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+        except OSError:
+            return True
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+class ElasticsearchShipper(Shipper):
+    """Indexes JSON lines straight into Elasticsearch with the _bulk API.
+
+    This bypasses Logstash to give a baseline ingest rate. Documents are sent
+    exactly as generated, into the same daily logs-YYYY.MM.dd index (dated
+    when the batch is sent, as Logstash's @timestamp would be). Each of the
+    workers keeps a connection and one bulk request in flight. Items that
+    come back with 429 or 5xx are retried on their own. Other per-item
+    errors are counted as rejected and dropped, since resending would fail
+    again.
+    """
+
+    RETRYABLE = {429, 500, 502, 503, 504}
+
+    def __init__(self, url, index=ES_INDEX, compress=ES_BULK_GZIP, timeout=ES_TIMEOUT,
+                 workers=ES_CONCURRENCY, **kwargs):
+        parsed = urllib.parse.urlsplit(url)
+        self.url = url
+        self.target = url
+        self.index = index
+        self.compress = compress
+        self.timeout = timeout
+        self._scheme = parsed.scheme
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._path = parsed.path.rstrip('/') + '/_bulk'
+        self._headers = {'Content-Type': 'application/x-ndjson'}
+        if compress:
+            self._headers['Content-Encoding'] = 'gzip'
+        if parsed.username:
+            credentials = f'{urllib.parse.unquote(parsed.username)}:{urllib.parse.unquote(parsed.password or "")}'
+            self._headers['Authorization'] = 'Basic ' + base64.b64encode(credentials.encode()).decode()
+        self._local = threading.local()
+        self._reported_errors = set()
+        super().__init__(workers=workers, **kwargs)
+
+    def _send(self, lines):
+        action = json.dumps({"index": {"_index": time.strftime(self.index, time.gmtime())}}).encode() + b'\n'
+        body = action + action.join(lines)
+        if self.compress:
+            body = gzip.compress(body, compresslevel=1)
+        status, payload = self._post(body)
+        with self._cond:
+            self.bytes_sent += len(body)
+        if status in self.RETRYABLE:
+            raise ConnectionError(f'bulk request returned HTTP {status}')
+        if status >= 300:
+            # The whole request was refused, e.g. 400 or 413; resending won't help
+            self._count_rejected(len(lines), f'HTTP {status}: {payload[:200]!r}')
+            return []
+        result = json.loads(payload)
+        if not result.get('errors'):
+            return []
+        retry, rejected = [], 0
+        for line, item in zip(lines, result['items']):
+            outcome = next(iter(item.values()))
+            if outcome.get('status', 200) in self.RETRYABLE:
+                retry.append(line)
+            elif outcome.get('status', 200) >= 300:
+                rejected += 1
+                error = outcome.get('error', {})
+                reason = f"{error.get('type')}: {error.get('reason')}" if isinstance(error, dict) else error
+        if rejected:
+            self._count_rejected(rejected, reason)
+        return retry
+
+    def _post(self, body):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self._scheme == 'https' else http.client.HTTPConnection
+            conn = self._local.conn = factory(self._host, self._port, timeout=self.timeout)
+        try:
+            conn.request('POST', self._path, body=body, headers=self._headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            self._local.conn = None
+            raise ConnectionError(str(e)) from e
+
+    def _count_rejected(self, count, reason):
+        # _deliver() counts every event it doesn't retry as sent
+        with self._cond:
+            self.events_rejected += count
+            self.events_sent -= count
+            report = reason not in self._reported_errors and len(self._reported_errors) < 10
+            self._reported_errors.add(reason)
+        if report:
+            print(f"Elasticsearch rejected {count} logs: {reason}")
 
-def send_log(log_data):
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.connect((LOGSTASH_HOST, LOGSTASH_PORT))
-        sock.sendall((json.dumps(log_data) + '\n').encode())
-        sock.close()
-    except Exception as e:
-        print(f"Failed to send log: {e}")
 
 def generate_log():
-    level = random.choices(log_levels, weights=[10, 50, 20, 15, 5])[0]
+    level = random.choices(log_levels, weights=level_weights)[0]
     endpoint = random.choice(endpoints)
     method = random.choice(methods)
     response_time = random.randint(10, 500)
-    status = random.choices([200, 201, 400, 404, 500], weights=[70, 10, 10, 5, 5])[0]
+    status = random.choices(status_codes, weights=status_weights)[0]
 
     return {
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
@@ -38,11 +649,664 @@ def generate_log():
         "message": f"{method} {endpoint} returned {status} in {response_time}ms"
     }
 
+
+class LogSynthesizer:
+    """Draws events in batches with the same distributions as generate_log().
+
+    Each field is drawn for the whole batch at once (with NumPy when it is
+    installed) and folded into one index per level/endpoint/method/status
+    combination. Every combination has its JSON line rendered up front, so
+    an event costs one string format instead of a json.dumps(), and the
+    timestamp is rendered once per second. A seed makes the sequence
+    reproducible for a given backend.
+    """
+
+    def __init__(self, seed=None):
+        if np is not None:
+            self._rng = np.random.default_rng(seed)
+            self._level_p = np.array(level_weights) / sum(level_weights)
+            self._status_p = np.array(status_weights) / sum(status_weights)
+        else:
+            self._rng = random.Random(seed)
+        quote = lambda value: json.dumps(value).replace('%', '%%')
+        self._combos = []
+        self._templates = []
+        for level in log_levels:
+            for endpoint in endpoints:
+                for method in methods:
+                    for status in status_codes:
+                        self._combos.append((level, endpoint, method, status))
+                        # Same bytes json.dumps() would produce for the event
+                        message = quote(f"{method} {endpoint} returned {status} in ")[:-1] + '%dms"'
+                        self._templates.append(
+                            '{"timestamp": "%s", "level": ' + quote(level)
+                            + ', "service": "log-generator", "endpoint": ' + quote(endpoint)
+                            + ', "method": ' + quote(method) + ', "status_code": ' + str(status)
+                            + ', "response_time_ms": %d, "message": ' + message + '}\n'
+                        )
+        self._second = None
+        self._timestamp = None
+
+    def timestamp(self):
+        now = int(time.time())
+        if now != self._second:
+            self._second = now
+            self._timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
+        return self._timestamp
+
+    def _draw(self, count):
+        # Return (combination indexes, response times) for count events
+        rng = self._rng
+        if np is not None:
+            combo = rng.choice(len(log_levels), count, p=self._level_p)
+            combo = combo * len(endpoints) + rng.integers(0, len(endpoints), count)
+            combo = combo * len(methods) + rng.integers(0, len(methods), count)
+            combo = combo * len(status_codes) + rng.choice(len(status_codes), count, p=self._status_p)
+            times = rng.integers(response_times.start, response_times.stop, count)
+            return combo.tolist(), times.tolist()
+        combo = rng.choices(range(len(log_levels)), weights=level_weights, k=count)
+        for size, weights in ((len(endpoints), None), (len(methods), None),
+                              (len(status_codes), status_weights)):
+            draw = rng.choices(range(size), weights=weights, k=count)
+            combo = [c * size + d for c, d in zip(combo, draw)]
+        return combo, rng.choices(response_times, k=count)
+
+    def lines(self, count):
+        """Return count encoded JSON lines, ready for TCPShipper.send_lines()."""
+        combo, times = self._draw(count)
+        timestamp = self.timestamp()
+        templates = self._templates
+        return [(templates[c] % (timestamp, t, t)).encode() for c, t in zip(combo, times)]
+
+    def events(self, count):
+        """Return count event dicts shaped like generate_log()."""
+        combo, times = self._draw(count)
+        timestamp = self.timestamp()
+        events = []
+        for c, t in zip(combo, times):
+            level, endpoint, method, status = self._combos[c]
+            events.append({
+                "timestamp": timestamp,
+                "level": level,
+                "service": "log-generator",
+                "endpoint": endpoint,
+                "method": method,
+                "status_code": status,
+                "response_time_ms": t,
+                "message": f"{method} {endpoint} returned {status} in {t}ms"
+            })
+        return events
+
+
+class TokenBucket:
+    """Paces a sender to rate(t) events/sec, t being seconds since start.
+
+    The bucket holds at most depth seconds' worth of tokens, so a sender that
+    was held up by backpressure catches up with a short burst rather than
+    flooding the sink with everything it missed.
+    """
+
+    def __init__(self, rate, start, depth=0.05):
+        self.rate = rate
+        self.start = start
+        self.depth = depth
+        self._last = start
+        self._tokens = 0.0
+
+    def take(self, limit):
+        # Block until at least one event may be sent; return how many may
+        while True:
+            now = time.monotonic()
+            rate = max(0.0, self.rate(now - self.start))
+            capacity = max(1.0, rate * self.depth)
+            self._tokens = min(capacity, self._tokens + (now - self._last) * rate)
+            self._last = now
+            if self._tokens >= 1:
+                count = min(limit, int(self._tokens))
+                self._tokens -= count
+                return count
+            wait = (1 - self._tokens) / rate if rate > 0 else self.depth
+            time.sleep(min(wait, self.depth))
+
+
+def rate_profile(args):
+    """Return a function mapping seconds since start to the target events/sec."""
+    target, start = args.rate, args.start_rate
+    if args.profile == 'ramp':
+        return lambda t: start + (target - start) * min(1.0, t / args.ramp_seconds)
+    if args.profile == 'step':
+        return lambda t: min(target, start + args.step_rate * math.floor(t / args.step_seconds))
+    if args.profile == 'burst':
+        def burst(t):
+            in_burst = t % args.burst_every < args.burst_seconds
+            return target * args.burst_multiplier if in_burst else target
+        return burst
+    return lambda t: target
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def open_spool(name=None):
+    if not SPOOL_DIR:
+        return None
+    return DiskSpool(os.path.join(SPOOL_DIR, name) if name else SPOOL_DIR)
+
+
+def make_shipper(args, spool=None):
+    if args.sink == 'elasticsearch':
+        return ElasticsearchShipper(ELASTICSEARCH_URL, spool=spool)
+    return TCPShipper(LOGSTASH_HOST, LOGSTASH_PORT, spool=spool)
+
+
+# stats key, metric name, type, help
+METRICS = [
+    ('generated', 'loggen_events_generated_total', 'counter', 'Events synthesised or read from a capture'),
+    ('sent', 'loggen_events_sent_total', 'counter', 'Events delivered to the sink'),
+    ('rejected', 'loggen_events_rejected_total', 'counter', 'Events the sink refused that were not retried'),
+    ('errors', 'loggen_send_failures_total', 'counter', 'Batch sends that failed and were retried'),
+    ('bytes', 'loggen_sent_bytes_total', 'counter', 'Bytes written to the sink, after compression'),
+    ('spooled', 'loggen_events_spooled_total', 'counter', 'Events written to the disk spool'),
+    ('unspooled', 'loggen_events_unspooled_total', 'counter', 'Events delivered from the disk spool'),
+    ('dropped', 'loggen_events_dropped_total', 'counter', 'Events discarded by the spool drop policy'),
+    ('buffered', 'loggen_buffered_events', 'gauge', 'Events held in memory, including batches in flight'),
+    ('spool_bytes', 'loggen_spool_bytes', 'gauge', 'Size of the disk spool'),
+]
+HISTOGRAMS = [
+    ('batch_size', 'loggen_batch_size_events', BATCH_SIZE_BUCKETS, 'Events per batch send attempt'),
+    ('send_latency', 'loggen_send_latency_seconds', SEND_LATENCY_BUCKETS, 'Time to write one batch to the sink'),
+]
+
+
+def merge_stats(stats):
+    """Sum Shipper.stats() snapshots (plus 'generated') from several senders."""
+    merged = collections.defaultdict(int)
+    for snapshot in stats:
+        for key, value in snapshot.items():
+            if isinstance(value, dict):
+                total = merged.get(key) or {'counts': [0] * len(value['counts']), 'sum': 0.0}
+                total = {'counts': [a + b for a, b in zip(total['counts'], value['counts'])],
+                         'sum': total['sum'] + value['sum']}
+                merged[key] = total
+            else:
+                merged[key] += value
+    return merged
+
+
+def render_metrics(stats, sink):
+    label = f'{{sink="{sink}"}}'
+    lines = []
+    for key, name, kind, help_text in METRICS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}',
+                  f'{name}{label} {stats.get(key, 0)}']
+    for key, name, buckets, help_text in HISTOGRAMS:
+        snapshot = stats.get(key) or {'counts': [0] * (len(buckets) + 1), 'sum': 0.0}
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        cumulative = 0
+        for bound, count in zip(list(buckets) + ['+Inf'], snapshot['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{{sink="{sink}",le="{bound}"}} {cumulative}')
+        lines += [f'{name}_sum{label} {snapshot["sum"]}', f'{name}_count{label} {cumulative}']
+    return '\n'.join(lines) + '\n'
+
+
+def serve_metrics(port, collect, sink):
+    """Serve render_metrics(collect()) on /metrics from a background thread."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_metrics(collect(), sink).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    print(f"Serving metrics on :{port}/metrics")
+    return server
+
+
+def load_worker(index, args, start, stop, results):
+    # Runs in its own process: its own connection, paced at 1/senders of the rate
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    profile = rate_profile(args)
+    bucket = TokenBucket(lambda t: profile(t) / args.senders, start)
+    spool = open_spool(f'worker-{index}')
+    shipper = make_shipper(args, spool)
+    synthesizer = LogSynthesizer(None if args.seed is None else args.seed + index)
+    recorder = None
+    if args.record:
+        recorder = CaptureWriter(worker_capture_path(args.record, index) if args.senders > 1 else args.record)
+    generated = [0]
+    done = [False]
+
+    def report(final=False):
+        results.put({
+            'worker': index,
+            'stats': dict(shipper.stats(), generated=generated[0]),
+            'latencies': shipper.take_latencies(),
+            'final': final,
+        })
+
+    def reporter():
+        # Ticks in step with the parent; stop.wait() is avoided because a
+        # waiter killed at process exit leaves the shared Event unusable
+        next_at = start + args.report_interval
+        while True:
+            time.sleep(max(0.0, next_at - time.monotonic()))
+            if stop.is_set() or done[0]:
+                return
+            report()
+            next_at += args.report_interval
+
+    threading.Thread(target=reporter, daemon=True).start()
+    deadline = start + args.duration if args.duration else None
+    while not stop.is_set() and (deadline is None or time.monotonic() < deadline):
+        count = bucket.take(BATCH_SIZE)
+        lines = synthesizer.lines(count)
+        shipper.send_lines(lines)
+        if recorder:
+            recorder.write(lines)
+        generated[0] += count
+    done[0] = True
+    shipper.close()
+    if recorder:
+        recorder.close()
+    report(final=True)
+
+
+def run_load(args):
+    """Drive args.senders worker processes and print live and final stats."""
+    start = time.monotonic() + 0.5  # let every worker connect before pacing starts
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=load_worker, args=(i, args, start, stop, results), daemon=True)
+        for i in range(args.senders)
+    ]
+    for worker in workers:
+        worker.start()
+
+    profile = rate_profile(args)
+    latest = {}
+    window, all_latencies = [], []
+    previous = {'generated': 0, 'sent': 0, 'errors': 0}
+    previous_at = start
+    # Workers report on the same ticks; give their results a moment to arrive
+    grace = min(0.2, args.report_interval / 4)
+    finished = set()
+
+    def totals():
+        return merge_stats([r['stats'] for r in list(latest.values())])
+
+    if METRICS_PORT:
+        # Refreshed as the workers report, every --report-interval
+        serve_metrics(METRICS_PORT, totals, args.sink)
+
+    try:
+        while len(finished) < len(workers):
+            try:
+                wait = previous_at + args.report_interval + grace - time.monotonic()
+                result = results.get(timeout=max(0.0, wait))
+                latest[result['worker']] = result
+                window.extend(result['latencies'])
+                if result['final']:
+                    finished.add(result['worker'])
+            except queue.Empty:
+                pass
+            if not any(w.is_alive() for w in workers) and results.empty():
+                break
+            tick = previous_at + args.report_interval
+            if time.monotonic() < tick + grace:
+                continue
+            current = totals()
+            elapsed = tick - previous_at
+            window.sort()
+            ms = lambda v: '-' if v is None else f'{v * 1000:.1f}'
+            # Mean target over the window, so bursts shorter than it still show
+            points = [previous_at - start + elapsed * (i + 0.5) / 20 for i in range(20)]
+            target = sum(profile(t) for t in points) / len(points)
+            print(f"t={tick - start:6.1f}s target={target:8.0f}/s "
+                  f"generated={(current['generated'] - previous['generated']) / elapsed:8.0f}/s "
+                  f"sent={(current['sent'] - previous['sent']) / elapsed:8.0f}/s "
+                  f"buffered={current['buffered']} errors={current['errors'] - previous['errors']} "
+                  f"rejected={current['rejected']} spooled={current['spooled'] - current['unspooled']} "
+                  f"dropped={current['dropped']} "
+                  f"batch_ms p50={ms(percentile(window, 50))} p95={ms(percentile(window, 95))} "
+                  f"p99={ms(percentile(window, 99))}", flush=True)
+            all_latencies.extend(window)
+            window = []
+            previous, previous_at = current, tick
+    except (KeyboardInterrupt, SystemExit):
+        pass  # Ctrl-C or docker stop: flush the workers and still summarise
+    finally:
+        stop.set()
+        while len(finished) < len(workers) and any(w.is_alive() for w in workers):
+            try:
+                result = results.get(timeout=SHUTDOWN_TIMEOUT + RECONNECT_BACKOFF_MAX)
+            except queue.Empty:
+                break
+            latest[result['worker']] = result
+            all_latencies.extend(result['latencies'])
+            if result['final']:
+                finished.add(result['worker'])
+        for worker in workers:
+            worker.join(1)
+
+    all_latencies.extend(window)
+    all_latencies.sort()
+    current = totals()
+    elapsed = max(1e-9, time.monotonic() - start)
+    # Spool lines written before this run and still there at the end
+    left_in_spool = current['recovered'] + current['spooled'] - current['unspooled'] - current['dropped']
+    summary = {
+        'duration_s': round(elapsed, 1),
+        'senders': args.senders,
+        'profile': args.profile,
+        'generated': current['generated'],
+        'recovered_from_spool': current['recovered'],
+        'sent': current['sent'],
+        'rejected': current['rejected'],
+        'dropped': current['dropped'],
+        'left_in_spool': left_in_spool,
+        # 0 when every event was sent once or kept; < 0 means duplicates, > 0 loss
+        'unaccounted': (current['generated'] + current['recovered'] - current['sent']
+                        - current['rejected'] - current['dropped'] - left_in_spool),
+        'send_errors': current['errors'],
+        'bytes_sent': current['bytes'],
+        'achieved_rate': round(current['sent'] / elapsed, 1),
+        'batch_latency_ms': {
+            'p50': None if not all_latencies else round(percentile(all_latencies, 50) * 1000, 3),
+            'p95': None if not all_latencies else round(percentile(all_latencies, 95) * 1000, 3),
+            'p99': None if not all_latencies else round(percentile(all_latencies, 99) * 1000, 3),
+        },
+    }
+    print(json.dumps(summary, indent=2))
+
+
+def run_bench(args):
+    """Compare per-event and batch synthesis throughput."""
+    def measure(name, produce):
+        produced, started = 0, time.perf_counter()
+        while produced < args.events:
+            produced += produce()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<32} {produced / elapsed:>12,.0f} events/s")
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    synthesizer = LogSynthesizer(args.seed)
+    print(f"{args.events:,} events, batch size {args.batch}, "
+          f"backend {'numpy' if np is not None else 'random'}")
+    def single():
+        (json.dumps(generate_log()) + '\n').encode()
+        return 1
+
+    measure('generate_log + json.dumps', single)
+    measure('LogSynthesizer.events', lambda: len(synthesizer.events(args.batch)))
+    measure('LogSynthesizer.lines', lambda: len(synthesizer.lines(args.batch)))
+
+
+class CaptureWriter:
+    """Appends shipped lines to an NDJSON capture, gzipped if the path ends in .gz."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'ab') if path.endswith('.gz') else open(path, 'ab')
+
+    def write(self, lines):
+        self._file.writelines(lines)
+
+    def close(self):
+        self._file.close()
+
+
+def worker_capture_path(path, index):
+    # capture.ndjson.gz -> capture-2.ndjson.gz, one file per load-mode sender
+    base, ext = path, ''
+    for suffix in ('.gz', '.ndjson', '.jsonl', '.json'):
+        if base.endswith(suffix):
+            base, ext = base[:-len(suffix)], suffix + ext
+    return f'{base}-{index}{ext}'
+
+
+def read_capture(path):
+    """Yield the lines of an NDJSON capture one at a time, gunzipping if needed."""
+    with open(path, 'rb') as f:
+        gzipped = f.read(2) == b'\x1f\x8b'
+    with (gzip.open(path, 'rb') if gzipped else open(path, 'rb')) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line + b'\n'
+
+
+def parse_event_time(value):
+    # ISO 8601 string or epoch seconds/milliseconds -> epoch seconds
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value / 1000.0 if value > 1e11 else float(value)
+    if isinstance(value, str):
+        try:
+            moment = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=datetime.timezone.utc)
+        return moment.timestamp()
+    return None
+
+
+def run_replay(args):
+    """Replay a capture to the sink, keeping its inter-arrival times scaled by --speed."""
+    shipper = make_shipper(args, open_spool())
+    fields = [args.time_field, '@timestamp'] if args.time_field != '@timestamp' else [args.time_field]
+    speed = args.speed
+    started = time.monotonic()
+    first_time = last_time = None
+    last_value, last_parsed = None, None
+    batch = []
+    replayed = untimed = 0
+    max_lag = 0.0
+    report_at = started + args.report_interval
+    reported, reported_at = 0, started
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT, lambda: dict(shipper.stats(), generated=replayed), args.sink)
+
+    def flush():
+        nonlocal batch
+        if batch:
+            shipper.send_lines(batch)
+            batch = []
+
+    try:
+        for line in read_capture(args.input):
+            if speed:
+                try:
+                    event = json.loads(line)
+                    value = next((event[f] for f in fields if f in event), None)
+                except (ValueError, TypeError):
+                    value = None
+                if value != last_value:  # consecutive events usually share a timestamp
+                    last_value, last_parsed = value, parse_event_time(value)
+                event_time = last_parsed
+                if event_time is None:
+                    untimed += 1  # sent alongside the previous event
+                    event_time = last_time
+                if event_time is not None:
+                    if first_time is None:
+                        first_time = event_time
+                    last_time = event_time
+                    due = started + (event_time - first_time) / speed
+                    now = time.monotonic()
+                    if due - now > 0.001:
+                        flush()
+                        time.sleep(due - now)
+                    else:
+                        max_lag = max(max_lag, now - due)
+            batch.append(line)
+            replayed += 1
+            if len(batch) >= BATCH_SIZE:
+                flush()
+            now = time.monotonic()
+            if now >= report_at:
+                flush()
+                position = '' if first_time is None else f" capture_t={last_time - first_time:.1f}s"
+                print(f"t={now - started:6.1f}s replayed={replayed} "
+                      f"rate={(replayed - reported) / (now - reported_at):8.0f}/s{position} "
+                      f"buffered={shipper.buffered}", flush=True)
+                reported, reported_at = replayed, now
+                report_at = now + args.report_interval
+        flush()
+    finally:
+        pending = shipper.close()
+
+    elapsed = max(1e-9, time.monotonic() - started)
+    print(json.dumps({
+        'input': args.input,
+        'speed': speed or 'max',
+        'replayed': replayed,
+        'untimed': untimed,
+        'unsent': pending,
+        'duration_s': round(elapsed, 1),
+        'capture_span_s': None if first_time is None else round(last_time - first_time, 1),
+        'achieved_rate': round(replayed / elapsed, 1),
+        'max_lag_s': round(max_lag, 3),
+    }, indent=2))
+
+
+def replay_speed(value):
+    if value in ('max', '0'):
+        return 0.0
+    try:
+        speed = float(value.rstrip('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid speed {value!r}")
+    if speed <= 0:
+        raise argparse.ArgumentTypeError('speed must be positive, or max')
+    return speed
+
+
+def handle_sigterm(signum, frame):
+    # Let `docker stop` run the finally block so buffered events are flushed
+    raise SystemExit(0)
+
+
+def run_trickle(args):
+    shipper = make_shipper(args, open_spool())
+    recorder = CaptureWriter(args.record) if args.record else None
+    generated = 0
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT, lambda: dict(shipper.stats(), generated=generated), args.sink)
+    try:
+        while True:
+            log = generate_log()
+            shipper.send(log)
+            generated += 1
+            if recorder:
+                recorder.write([(json.dumps(log) + '\n').encode()])
+            if args.print_events:
+                print(f"Queued: {log['message']}")
+            time.sleep(random.uniform(0.5, 2.0))
+    finally:
+        pending = shipper.close()
+        if recorder:
+            recorder.close()
+        if pending:
+            print(f"Dropped {pending} buffered logs on shutdown")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic access logs for the ELK stack.')
+    parser.add_argument('mode', nargs='?', choices=['trickle', 'load', 'replay', 'bench'],
+                        default=os.environ.get('GENERATOR_MODE', 'trickle'),
+                        help='trickle: one event every 0.5-2s (default); load: paced high-rate '
+                             'load; replay: resend a capture; bench: measure event synthesis '
+                             'speed without sending')
+    parser.add_argument('--sink', choices=['logstash', 'elasticsearch'], default=SINK,
+                        help='logstash: json_lines over TCP (default); elasticsearch: the _bulk '
+                             'API directly, bypassing Logstash')
+    parser.add_argument('--seed', type=int, help='seed event synthesis for a reproducible stream')
+    parser.add_argument('--print-events', action='store_true',
+                        help='trickle: print every event (METRICS_PORT gives totals instead)')
+    parser.add_argument('--record', metavar='PATH',
+                        help='trickle and load: also append every event to this NDJSON capture '
+                             '(gzipped if it ends in .gz; one file per sender with --senders > 1)')
+    load = parser.add_argument_group('load mode')
+    load.add_argument('--rate', type=float, default=1000.0,
+                      help='target events/sec; the peak for ramp and step (default: 1000)')
+    load.add_argument('--senders', type=int, default=1,
+                      help='worker processes, each with its own connection (default: 1)')
+    load.add_argument('--duration', type=float, default=0,
+                      help='seconds to run; 0 runs until interrupted (default: 0)')
+    load.add_argument('--profile', choices=['constant', 'ramp', 'step', 'burst'], default='constant')
+    load.add_argument('--start-rate', type=float, default=0.0,
+                      help='ramp and step: events/sec at t=0 (default: 0)')
+    load.add_argument('--ramp-seconds', type=float, default=60.0,
+                      help='ramp: seconds to reach --rate (default: 60)')
+    load.add_argument('--step-rate', type=float, default=1000.0,
+                      help='step: events/sec added each step (default: 1000)')
+    load.add_argument('--step-seconds', type=float, default=30.0,
+                      help='step: seconds per step (default: 30)')
+    load.add_argument('--burst-every', type=float, default=30.0,
+                      help='burst: seconds between burst starts (default: 30)')
+    load.add_argument('--burst-seconds', type=float, default=5.0,
+                      help='burst: length of each burst (default: 5)')
+    load.add_argument('--burst-multiplier', type=float, default=5.0,
+                      help='burst: rate multiplier during a burst (default: 5)')
+    load.add_argument('--report-interval', type=float, default=1.0,
+                      help='seconds between live stats lines (default: 1)')
+    replay = parser.add_argument_group('replay mode')
+    replay.add_argument('--input', metavar='PATH', help='NDJSON capture to replay, optionally gzipped')
+    replay.add_argument('--speed', type=replay_speed, default=1.0,
+                        help='playback speed, e.g. 1, 10x or max (default: 1)')
+    replay.add_argument('--time-field', default='timestamp',
+                        help='event field holding its time; @timestamp is tried next (default: timestamp)')
+    bench = parser.add_argument_group('bench mode')
+    bench.add_argument('--events', type=int, default=200000,
+                       help='events to synthesise per method (default: 200000)')
+    bench.add_argument('--batch', type=int, default=BATCH_SIZE,
+                       help=f'events per batch call (default: {BATCH_SIZE})')
+    args = parser.parse_args(argv)
+    if args.senders < 1:
+        parser.error('--senders must be at least 1')
+    if args.ramp_seconds <= 0 or args.step_seconds <= 0 or args.burst_every <= 0:
+        parser.error('--ramp-seconds, --step-seconds and --burst-every must be positive')
+    if args.mode == 'replay' and not args.input:
+        parser.error('replay needs --input')
+    return args
+
+
 if __name__ == "__main__":
-    print(f"Sending logs to {LOGSTASH_HOST}:{LOGSTASH_PORT}")
-    
-    while True:
-        log = generate_log()
-        send_log(log)
-        print(f"Sent: {log['message']}")
-        time.sleep(random.uniform(0.5, 2.0))
+    args = parse_args()
+    if args.mode == 'bench':
+        run_bench(args)
+        raise SystemExit(0)
+    if args.sink == 'elasticsearch':
+        print(f"Sending logs to {ELASTICSEARCH_URL} ({ES_INDEX})")
+    else:
+        print(f"Sending logs to {LOGSTASH_HOST}:{LOGSTASH_PORT}")
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    try:
+        if args.mode == 'load':
+            run_load(args)
+        elif args.mode == 'replay':
+            run_replay(args)
+        else:
+            run_trickle(args)
+    except KeyboardInterrupt:
+        pass
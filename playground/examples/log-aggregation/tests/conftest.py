@@ -0,0 +1,32 @@
+# The tests import app/generator.py directly; nothing is sent to Logstash or
+# Elasticsearch.
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+sys.path.insert(0, APP_DIR)
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances monotonic() instantly."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        # Like a real sleep, even a tiny one lets some time pass
+        self.now += max(seconds, 1e-6)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    import generator
+
+    fake = FakeClock()
+    monkeypatch.setattr(generator, 'time', fake)
+    return fake
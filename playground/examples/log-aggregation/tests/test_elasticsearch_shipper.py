@@ -0,0 +1,61 @@
+import json
+
+from generator import ElasticsearchShipper
+
+
+class ScriptedShipper(ElasticsearchShipper):
+    """Answers each bulk request with the next (status, payload) in the script."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = []
+        super().__init__('http://es.invalid:9200', compress=False, workers=1,
+                         batch_size=4, backoff_min=0.001, backoff_max=0.001)
+
+    def _post(self, body):
+        # Bulk bodies alternate action and document lines
+        self.requests.append(body.splitlines(keepends=True)[1::2])
+        return self.script.pop(0)
+
+
+def items(*statuses):
+    return json.dumps({
+        'errors': any(status >= 300 for status in statuses),
+        'items': [{'index': {'status': status, 'error': {'type': 'x', 'reason': 'y'}} if status >= 300
+                             else {'status': status}} for status in statuses],
+    }).encode()
+
+
+def ship(shipper, count=4):
+    lines = [f'{{"n": {i}}}\n'.encode() for i in range(count)]
+    shipper.send_lines(lines)
+    assert shipper.close(timeout=5) == 0
+    return lines
+
+
+def test_only_retryable_items_are_resent():
+    shipper = ScriptedShipper([(200, items(201, 429, 400, 503)), (200, items(201, 201))])
+    lines = ship(shipper)
+
+    assert shipper.requests == [lines, [lines[1], lines[3]]]
+    assert shipper.events_sent == 3
+    assert shipper.events_rejected == 1
+    assert shipper.send_errors == 0
+
+
+def test_retryable_request_status_resends_the_whole_batch():
+    shipper = ScriptedShipper([(503, b''), (429, b''), (200, items(201, 201, 201, 201))])
+    lines = ship(shipper)
+
+    assert shipper.requests == [lines] * 3
+    assert shipper.events_sent == 4
+    assert shipper.send_errors == 2
+
+
+def test_refused_request_is_rejected_without_retry():
+    shipper = ScriptedShipper([(400, b'{"error": "bad request"}')])
+    lines = ship(shipper)
+
+    assert shipper.requests == [lines]
+    assert shipper.events_sent == 0
+    assert shipper.events_rejected == 4
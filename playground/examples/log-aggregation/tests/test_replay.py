@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+import generator
+from generator import CaptureWriter, parse_args, parse_event_time, read_capture, run_replay
+
+
+class RecordingShipper:
+    """Records when each batch reaches the sink, by the fake clock."""
+
+    buffered = 0
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.batches = []
+
+    def send_lines(self, lines):
+        self.batches.append((round(self.clock.now - 100.0, 3), [json.loads(line)['n'] for line in lines]))
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        return 0
+
+
+@pytest.fixture
+def shipper(clock, monkeypatch):
+    recorder = RecordingShipper(clock)
+    monkeypatch.setattr(generator, 'make_shipper', lambda args, spool=None: recorder)
+    return recorder
+
+
+def capture(path, events):
+    writer = CaptureWriter(str(path))
+    writer.write([(json.dumps(event) + '\n').encode() for event in events])
+    writer.close()
+    return str(path)
+
+
+EVENTS = [
+    {'n': 0, 'timestamp': '2024-05-01T12:00:00'},
+    {'n': 1, 'timestamp': '2024-05-01T12:00:00'},
+    {'n': 2},  # no timestamp: goes with the event before it
+    {'n': 3, 'timestamp': '2024-05-01T12:00:01Z'},
+    {'n': 4, 'timestamp': 1714564803000},  # epoch milliseconds, 12:00:03
+]
+
+
+def test_replay_keeps_inter_arrival_times_scaled_by_speed(tmp_path, shipper, capsys):
+    path = capture(tmp_path / 'capture.ndjson.gz', EVENTS)
+    run_replay(parse_args(['replay', '--input', path, '--speed', '10x']))
+
+    assert shipper.batches == [(0.0, [0, 1, 2]), (0.1, [3]), (0.3, [4])]
+    summary = json.loads(capsys.readouterr().out)
+    assert summary['replayed'] == 5
+    assert summary['untimed'] == 1
+    assert summary['capture_span_s'] == 3.0
+
+
+def test_max_speed_does_not_wait(tmp_path, shipper, capsys):
+    path = capture(tmp_path / 'capture.ndjson', EVENTS)
+    run_replay(parse_args(['replay', '--input', path, '--speed', 'max']))
+
+    assert shipper.batches == [(0.0, [0, 1, 2, 3, 4])]
+
+
+def test_capture_round_trip_skips_blank_lines(tmp_path):
+    path = tmp_path / 'capture.ndjson.gz'
+    writer = CaptureWriter(str(path))
+    writer.write([b'{"n": 0}\n', b'\n', b'{"n": 1}'])
+    writer.close()
+    assert list(read_capture(str(path))) == [b'{"n": 0}\n', b'{"n": 1}\n']
+
+
+def test_parse_event_time():
+    assert parse_event_time('1970-01-01T00:01:00') == 60.0
+    assert parse_event_time('1970-01-01T01:00:00+01:00') == 0.0
+    assert parse_event_time(60) == 60.0
+    assert parse_event_time(60000 * 10 ** 7) == 60000 * 10 ** 4
+    assert parse_event_time('yesterday') is None
+    assert parse_event_time(True) is None
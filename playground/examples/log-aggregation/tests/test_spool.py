@@ -0,0 +1,76 @@
+import os
+
+from generator import DiskSpool
+
+
+def line(i):
+    return f'{{"n": {i}}}\n'.encode()
+
+
+def drain(spool, batch=3):
+    lines = []
+    while spool.pending:
+        lines += spool.read(batch)
+        spool.commit()
+    return lines
+
+
+def segments(path):
+    return sorted(name for name in os.listdir(path) if name.endswith('.seg'))
+
+
+def test_restart_resumes_after_the_last_committed_batch(tmp_path):
+    spool = DiskSpool(str(tmp_path), segment_bytes=4 * len(line(0)))
+    for i in range(10):
+        spool.append(line(i))
+    # Reads stop at the end of a segment, which holds four lines here
+    assert spool.read(6) == [line(i) for i in range(4)]
+    spool.commit()
+    assert spool.read(2) == [line(4), line(5)]  # in flight, never committed
+    spool.close()
+
+    reopened = DiskSpool(str(tmp_path), segment_bytes=4 * len(line(0)))
+    assert reopened.recovered == 6
+    assert drain(reopened) == [line(i) for i in range(4, 10)]
+    assert segments(tmp_path) == []
+
+
+def test_torn_tail_is_skipped_on_recovery(tmp_path):
+    spool = DiskSpool(str(tmp_path))
+    for i in range(3):
+        spool.append(line(i))
+    spool.close()
+    # A crash mid-write leaves a line without its newline
+    with open(tmp_path / segments(tmp_path)[-1], 'ab') as f:
+        f.write(b'{"n": 3')
+
+    reopened = DiskSpool(str(tmp_path))
+    reopened.append(line(4))
+    assert drain(reopened) == [line(0), line(1), line(2), line(4)]
+
+
+def test_prepended_lines_are_read_first(tmp_path):
+    spool = DiskSpool(str(tmp_path))
+    spool.append(line(2))
+    spool.prepend([line(0), line(1)])
+    assert drain(spool) == [line(0), line(1), line(2)]
+
+
+def test_oldest_policy_drops_whole_segments(tmp_path):
+    size = len(line(0))
+    spool = DiskSpool(str(tmp_path), max_bytes=4 * size, segment_bytes=2 * size, policy='oldest')
+    assert all(spool.append(line(i)) for i in range(7))
+
+    assert spool.dropped == 4
+    assert spool.bytes <= spool.max_bytes
+    assert drain(spool) == [line(4), line(5), line(6)]
+
+
+def test_newest_policy_rejects_incoming_events(tmp_path):
+    size = len(line(0))
+    spool = DiskSpool(str(tmp_path), max_bytes=4 * size, segment_bytes=2 * size, policy='newest')
+    accepted = [spool.append(line(i)) for i in range(6)]
+
+    assert accepted == [True] * 4 + [False] * 2
+    assert spool.dropped == 2
+    assert drain(spool) == [line(i) for i in range(4)]
@@ -0,0 +1,37 @@
+import generator
+from generator import TokenBucket
+
+
+def test_paces_to_the_target_rate(clock):
+    bucket = TokenBucket(lambda t: 1000.0, clock.now)
+
+    sent = 0
+    while clock.now < 102.0:
+        sent += bucket.take(100)
+    assert abs(sent - 2000) <= 1000 * bucket.depth
+
+
+def test_catches_up_with_a_bounded_burst(clock):
+    bucket = TokenBucket(lambda t: 1000.0, clock.now, depth=0.05)
+
+    clock.now += 5.0  # the sender was blocked by backpressure
+    assert bucket.take(10000) == 50
+
+
+def test_waits_while_the_rate_is_zero(clock):
+    start = clock.now
+    bucket = TokenBucket(lambda t: 0.0 if t < 1.0 else 100.0, start)
+
+    assert bucket.take(10) >= 1
+    assert clock.now >= start + 1.0
+
+
+def test_rate_profiles():
+    ramp = generator.rate_profile(generator.parse_args(
+        ['load', '--rate', '1000', '--start-rate', '200', '--profile', 'ramp', '--ramp-seconds', '10']))
+    assert [ramp(t) for t in (0, 5, 10, 20)] == [200, 600, 1000, 1000]
+
+    step = generator.rate_profile(generator.parse_args(
+        ['load', '--rate', '1000', '--start-rate', '200', '--profile', 'step',
+         '--step-rate', '300', '--step-seconds', '10']))
+    assert [step(t) for t in (0, 9.9, 10, 25, 100)] == [200, 200, 500, 800, 1000]
@@ -1,5 +1,11 @@
 # Kubeflow Training Pipeline
 
+import hashlib
+import inspect
+import json
+import os
+import sys
+
 import kfp
 from kfp import dsl
 from kfp.dsl import (
@@ -13,79 +19,390 @@ from kfp.dsl import (
 )
 from typing import NamedTuple
 
+# ==============================================================================
+# STEP CACHE
+# ==============================================================================
+# Shared by the cached components. Each lists these in additional_funcs, which
+# embeds their source in the component's program (and so in its
+# component_digest), so they import what they use.
+
+def artifact_digest(artifact) -> str:
+    """Identify an upstream artifact: its producer's cache key, or a hash of its files."""
+    import hashlib
+    import os
+
+    if artifact.metadata.get('cache_key'):
+        return artifact.metadata['cache_key']
+    digest = hashlib.sha256()
+    for d, _, names in sorted(os.walk(artifact.path)):
+        for name in sorted(names):
+            digest.update(os.path.relpath(os.path.join(d, name), artifact.path).encode())
+            with open(os.path.join(d, name), 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_restore(step, artifact, cache_root, cache_mode, key):
+    """Look a step up in the step cache; return ``(entry, outputs)``.
+
+    Entries are stored under a hash of ``key()``, which is only called with
+    caching on; cache_mode is 'use', 'refresh' or 'bypass'. On a hit the
+    entry's files are restored into artifact and outputs is the step's
+    cached return value. Otherwise outputs is None and entry is passed to
+    cache_store() once the step has written artifact (None when caching is
+    off).
+    """
+    import hashlib
+    import json
+    import os
+    import time
+    import fsspec
+
+    if not cache_root or cache_mode == 'bypass':
+        artifact.metadata['cache'] = 'off'
+        os.makedirs(artifact.path, exist_ok=True)
+        return None, None
+    cache_fs, cache_base = fsspec.core.url_to_fs(cache_root)
+    cache_key = hashlib.sha256(json.dumps(key(), sort_keys=True, default=str).encode()).hexdigest()
+    entry = f'{cache_base}/{step}/{cache_key}'
+    if cache_mode == 'use' and cache_fs.exists(f'{entry}/_outputs.json'):
+        try:
+            with cache_fs.open(f'{entry}/_outputs.json') as f:
+                cached = json.load(f)
+            for name in cached['files']:
+                os.makedirs(os.path.dirname(os.path.join(artifact.path, name)), exist_ok=True)
+                cache_fs.get_file(f'{entry}/files/{name}', os.path.join(artifact.path, name))
+            cache_fs.pipe_file(f'{entry}/_last_used', str(time.time()).encode())
+        except FileNotFoundError:
+            print(f'{step}: cache entry {cache_key} was evicted while restoring')
+        else:
+            print(f'{step}: cache hit {cache_key}')
+            artifact.metadata.update(cached['metadata'], cache='hit', cache_key=cache_key)
+            return None, tuple(cached['outputs'])
+    artifact.metadata['cache'] = 'miss'
+    os.makedirs(artifact.path, exist_ok=True)
+    return (cache_fs, entry, cache_key), None
+
+
+def cache_store(step, artifact, entry, outputs):
+    """Store artifact's files and outputs under entry, if any; return outputs."""
+    import json
+    import os
+    import time
+
+    if entry is None:
+        return outputs
+    cache_fs, entry, cache_key = entry
+    files = [
+        os.path.relpath(os.path.join(d, name), artifact.path)
+        for d, _, names in os.walk(artifact.path) for name in names
+    ]
+    for name in files:
+        cache_fs.makedirs(os.path.dirname(f'{entry}/files/{name}'), exist_ok=True)
+        cache_fs.put_file(os.path.join(artifact.path, name), f'{entry}/files/{name}')
+    # _outputs.json goes last and marks the entry complete
+    metadata = {k: v for k, v in artifact.metadata.items() if k not in ('cache', 'cache_key')}
+    cache_fs.pipe_file(f'{entry}/_outputs.json', json.dumps({
+        'outputs': list(outputs), 'files': files, 'metadata': metadata, 'created': time.time()
+    }).encode())
+    artifact.metadata['cache_key'] = cache_key
+    print(f'{step}: cache miss, stored {cache_key}')
+    return outputs
+
+
 # ==============================================================================
 # COMPONENT DEFINITIONS
 # ==============================================================================
 
 @component(
     base_image='python:3.10-slim',
-    packages_to_install=['pandas', 'numpy', 'scikit-learn', 'pyarrow']
+    packages_to_install=['pandas', 'numpy', 'scikit-learn', 'pyarrow', 'fsspec', 's3fs'],
+    additional_funcs=[cache_restore, cache_store]
 )
 def load_data(
     data_path: str,
     output_dataset: Output[Dataset],
-    split_ratio: float = 0.2
+    split_ratio: float = 0.2,
+    batch_rows: int = 0,
+    cache_root: str = '',
+    cache_mode: str = 'use',
+    code_version: str = '',
 ) -> NamedTuple('Outputs', [('num_samples', int), ('num_features', int)]):
-    """Load and split dataset."""
+    """Load and split dataset.
+
+    With batch_rows set, the data is streamed in record batches of that size
+    and split by a hash of each row instead of loaded whole.
+    """
     import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
     from sklearn.model_selection import train_test_split
-    import json
+    import fsspec
     
-    # Load data
-    df = pd.read_parquet(data_path)
+    # Source data is identified by the store's checksum (S3 ETag, GCS md5)
+    # or size and modification time, without reading it
+    def data_fingerprint(path):
+        fs, root = fsspec.core.url_to_fs(path)
+        infos = fs.find(root, detail=True) if fs.isdir(root) else {root: fs.info(root)}
+        return [
+            (name, info.get('ETag') or info.get('md5Hash') or info.get('crc32c'),
+             info.get('size'), info.get('mtime') or info.get('LastModified') or info.get('updated'))
+            for name, info in sorted(infos.items())
+        ]
     
-    # Split data
-    train_df, test_df = train_test_split(df, test_size=split_ratio, random_state=42)
+    # Step cache, keyed on this component's code, parameters and inputs
+    cache_entry, cached = cache_restore(
+        'load_data', output_dataset, cache_root, cache_mode,
+        lambda: [code_version, data_fingerprint(data_path), split_ratio, batch_rows]
+    )
+    if cached is not None:
+        return cached
     
-    # Save datasets
-    train_df.to_parquet(f'{output_dataset.path}/train.parquet')
-    test_df.to_parquet(f'{output_dataset.path}/test.parquet')
+    if batch_rows:
+        # Stream record batches; a row's split depends only on its values,
+        # so it is the same whatever the file layout or batch size
+        fs, root = fsspec.core.url_to_fs(data_path)
+        source = pads.dataset(root, filesystem=fs, format='parquet')
+        writers = {
+            split: pq.ParquetWriter(f'{output_dataset.path}/{split}.parquet', source.schema)
+            for split in ('train', 'test')
+        }
+        num_train = num_test = 0
+        # ParquetFile reads one row group at a time; the dataset scanner's
+        # readahead would hold many
+        for source_file in source.files:
+            with fs.open(source_file, 'rb') as f:
+                for batch in pq.ParquetFile(f).iter_batches(batch_size=batch_rows):
+                    buckets = pd.util.hash_pandas_object(batch.to_pandas(), index=False).to_numpy() % 10000
+                    is_test = buckets < split_ratio * 10000
+                    writers['train'].write_batch(batch.filter(pa.array(~is_test)))
+                    writers['test'].write_batch(batch.filter(pa.array(is_test)))
+                    num_test += int(is_test.sum())
+                    num_train += int((~is_test).sum())
+        for writer in writers.values():
+            writer.close()
+        columns = source.schema.names
+    else:
+        # Load data
+        df = pd.read_parquet(data_path)
+        
+        # Split data
+        train_df, test_df = train_test_split(df, test_size=split_ratio, random_state=42)
+        
+        # Save datasets
+        train_df.to_parquet(f'{output_dataset.path}/train.parquet')
+        test_df.to_parquet(f'{output_dataset.path}/test.parquet')
+        # run_local gives artifacts a frames dict to hand DataFrames to the
+        # next step in-process; KFP artifacts have none
+        if hasattr(output_dataset, 'frames'):
+            output_dataset.frames.update(train=train_df, test=test_df)
+        num_train, num_test, columns = len(train_df), len(test_df), list(df.columns)
     
     # Metadata
-    output_dataset.metadata['num_train_samples'] = len(train_df)
-    output_dataset.metadata['num_test_samples'] = len(test_df)
-    output_dataset.metadata['features'] = list(df.columns)
+    output_dataset.metadata['num_train_samples'] = num_train
+    output_dataset.metadata['num_test_samples'] = num_test
+    output_dataset.metadata['features'] = columns
     
-    return (len(df), len(df.columns) - 1)
+    return cache_store('load_data', output_dataset, cache_entry, (num_train + num_test, len(columns) - 1))
 
 
 @component(
     base_image='python:3.10-slim',
-    packages_to_install=['pandas', 'numpy', 'great_expectations']
+    packages_to_install=['pandas', 'numpy', 'pyarrow', 'fsspec', 's3fs'],
+    additional_funcs=[artifact_digest, cache_restore, cache_store]
 )
 def validate_data(
     input_dataset: Input[Dataset],
     validation_report: Output[Dataset],
+    reference_profile: str = '',
+    update_reference: bool = False,
+    null_tolerance: float = 0.05,
+    range_tolerance: float = 0.01,
+    drift_threshold: float = 0.3,
+    cache_root: str = '',
+    cache_mode: str = 'use',
+    code_version: str = '',
 ) -> NamedTuple('Outputs', [('is_valid', bool), ('num_issues', int)]):
-    """Validate data quality using Great Expectations."""
+    """Validate data quality against a reference profile.
+
+    The training split is profiled in one pass over Arrow record batches;
+    null counts and min/max come from the parquet footers when every row
+    group has them. With no reference profile, any null fails. Against a
+    reference, nulls may rise by null_tolerance, at most range_tolerance of
+    values may fall outside the reference min/max, and no column may drift
+    past drift_threshold (PSI). The profile is written to
+    reference_profile when none exists yet, or with update_reference, if
+    the data is valid.
+    """
     import pandas as pd
-    import great_expectations as ge
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
     import json
+    import os
+    import fsspec
     
-    # Load data
-    train_df = pd.read_parquet(f'{input_dataset.path}/train.parquet')
+    reference = None
+    if reference_profile:
+        reference_fs, reference_path = fsspec.core.url_to_fs(reference_profile)
+        if reference_fs.exists(reference_path):
+            with reference_fs.open(reference_path) as f:
+                reference = json.load(f)
+    
+    # Step cache, keyed on this component's code, parameters and inputs
+    cache_entry, cached = cache_restore(
+        'validate_data', validation_report, cache_root, cache_mode,
+        lambda: [code_version, artifact_digest(input_dataset), reference, update_reference,
+                 null_tolerance, range_tolerance, drift_threshold]
+    )
+    if cached is not None:
+        return cached
+    
+    parquet = pq.ParquetFile(f'{input_dataset.path}/train.parquet')
+    schema, footer = parquet.schema_arrow, parquet.metadata
+    columns = [name for name in schema.names if not name.startswith('__index_level_')]
+    numeric = [name for name in columns
+               if pa.types.is_integer(schema.field(name).type) or pa.types.is_floating(schema.field(name).type)]
+    ref_columns = reference['columns'] if reference else {}
     
-    # Create GE DataFrame
-    ge_df = ge.from_pandas(train_df)
+    # Null counts and min/max from the footers; None where a row group lacks them
+    def footer_stats(name):
+        index = footer.schema.names.index(name)
+        nulls, bounds = 0, []
+        for rg in range(footer.num_row_groups):
+            stats = footer.row_group(rg).column(index).statistics
+            if stats is None or not stats.has_null_count:
+                return None, None
+            nulls += stats.null_count
+            if stats.has_min_max:
+                bounds += [stats.min, stats.max]
+            elif stats.null_count < footer.row_group(rg).num_rows:
+                return nulls, None
+        return nulls, (min(bounds), max(bounds)) if bounds else None
     
-    # Define expectations
+    footers = {name: footer_stats(name) for name in columns}
+    
+    # Accumulators for the pass: distinct-value sketches (the K smallest
+    # value hashes), a uniform row sample for quantiles, per-bin counts
+    # against reference bins, category counts and out-of-range counts
+    K, SAMPLE, MAX_CATEGORIES = 1024, 20000, 10000
+    sketches = {name: np.empty(0, dtype=np.uint64) for name in columns}
+    nulls = {name: 0 for name in columns}
+    bounds = {name: [] for name in numeric}
+    sample_priority, sample = np.empty(0), np.empty((0, len(numeric)))
+    bin_counts = {name: np.zeros(len(ref_columns[name]['bins']) + 1, dtype=np.int64)
+                  for name in numeric if 'bins' in ref_columns.get(name, {})}
+    out_of_range = {name: 0 for name in numeric if ref_columns.get(name, {}).get('min') is not None}
+    categories = {name: pd.Series(dtype='float64') for name in columns if name not in numeric}
+    rng = np.random.default_rng(0)
+    
+    for batch in parquet.iter_batches(batch_size=65536, columns=columns):
+        values = {}
+        for name in columns:
+            column = batch.column(name)
+            nulls[name] += column.null_count
+            present = column.drop_null()
+            hashes = pd.util.hash_array(present.to_numpy(zero_copy_only=False))
+            sketches[name] = np.unique(np.concatenate([sketches[name], hashes]))[:K]
+            if name in numeric:
+                values[name] = present.to_numpy(zero_copy_only=False).astype(np.float64)
+                if len(present):
+                    lo_hi = pc.min_max(present)
+                    bounds[name] += [lo_hi['min'].as_py(), lo_hi['max'].as_py()]
+            elif categories.get(name) is not None:
+                value_counts = pc.value_counts(present)
+                counts = pd.Series(value_counts.field('counts').to_numpy(),
+                                   index=list(map(str, value_counts.field('values').to_pylist())))
+                categories[name] = categories[name].add(counts, fill_value=0)
+                if len(categories[name]) > MAX_CATEGORIES:
+                    categories[name] = None
+        for name in bin_counts:
+            edges = ref_columns[name]['bins']
+            bin_counts[name] += np.bincount(
+                np.searchsorted(edges, values[name], side='right'), minlength=len(edges) + 1
+            )
+        for name in out_of_range:
+            ref = ref_columns[name]
+            out_of_range[name] += int(((values[name] < ref['min']) | (values[name] > ref['max'])).sum())
+        if numeric:
+            rows = batch.select(numeric).to_pandas().to_numpy(dtype=np.float64, na_value=np.nan)
+            priority = np.concatenate([sample_priority, rng.random(len(rows))])
+            keep = np.argsort(priority)[:SAMPLE]
+            sample_priority, sample = priority[keep], np.concatenate([sample, rows])[keep]
+    
+    # Current profile
+    num_rows = footer.num_rows
+    profile = {'num_rows': num_rows, 'columns': {}}
+    for name in columns:
+        footer_nulls, footer_bounds = footers[name]
+        null_count = nulls[name] if footer_nulls is None else footer_nulls
+        sketch = sketches[name]
+        col = profile['columns'][name] = {
+            'type': str(schema.field(name).type),
+            'null_count': int(null_count),
+            'null_fraction': null_count / num_rows if num_rows else 0.0,
+            'distinct_estimate': int(len(sketch) if len(sketch) < K else (K - 1) * 2.0 ** 64 / float(sketch[-1])),
+        }
+        if name in numeric:
+            lo_hi = footer_bounds or ((min(bounds[name]), max(bounds[name])) if bounds[name] else (None, None))
+            col['min'], col['max'] = lo_hi
+            observed = sample[:, numeric.index(name)]
+            observed = observed[~np.isnan(observed)]
+            if len(observed):
+                qs = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+                col['quantiles'] = dict(zip([f'p{round(q * 100):02d}' for q in qs], np.quantile(observed, qs).tolist()))
+                edges = np.unique(np.quantile(observed, np.linspace(0.1, 0.9, 9)))
+                col['bins'] = edges.tolist()
+                col['fractions'] = (np.bincount(np.searchsorted(edges, observed, side='right'),
+                                                minlength=len(edges) + 1) / len(observed)).tolist()
+        elif categories[name] is not None:
+            counts = categories[name].sort_values(ascending=False)
+            total = counts.sum() or 1
+            col['top_values'] = {k: v / total for k, v in counts.head(50).items()}
+    
+    # Population stability index over matching bins
+    def psi(expected, actual):
+        expected = np.clip(np.asarray(expected, dtype=float), 1e-4, None)
+        actual = np.clip(np.asarray(actual, dtype=float), 1e-4, None)
+        return float(np.sum((actual - expected) * np.log(actual / expected)))
+    
+    drift = {}
+    for name, ref in ref_columns.items():
+        if name in bin_counts and bin_counts[name].sum():
+            drift[name] = psi(ref['fractions'], bin_counts[name] / bin_counts[name].sum())
+        elif 'top_values' in ref and profile['columns'].get(name, {}).get('top_values') is not None:
+            counts = categories[name]
+            total = counts.sum() or 1
+            actual = [counts.get(k, 0) / total for k in ref['top_values']]
+            expected = list(ref['top_values'].values())
+            drift[name] = psi(expected + [1 - sum(expected)], actual + [1 - sum(actual)])
+    
+    # Checks
     results = []
     
-    # Check for missing values
-    for col in train_df.columns:
-        result = ge_df.expect_column_values_to_not_be_null(col)
-        results.append(result)
+    def check(name, column, success, observed, threshold):
+        results.append({'check': name, 'column': column, 'success': bool(success),
+                        'observed': observed, 'threshold': threshold})
     
-    # Check value ranges
-    numeric_cols = train_df.select_dtypes(include=['number']).columns
-    for col in numeric_cols:
-        min_val = train_df[col].min()
-        max_val = train_df[col].max()
-        result = ge_df.expect_column_values_to_be_between(col, min_val, max_val)
-        results.append(result)
+    for name, ref in ref_columns.items():
+        check('column_present', name, name in profile['columns'], name in profile['columns'], True)
+        if name in profile['columns']:
+            current_type = profile['columns'][name]['type']
+            check('column_type', name, current_type == ref['type'], current_type, ref['type'])
+    for name, col in profile['columns'].items():
+        allowed = ref_columns[name]['null_fraction'] + null_tolerance if name in ref_columns else 0.0
+        check('null_fraction', name, col['null_fraction'] <= allowed, col['null_fraction'], allowed)
+    for name, count in out_of_range.items():
+        fraction = count / num_rows if num_rows else 0.0
+        check('outside_reference_range', name, fraction <= range_tolerance, fraction, range_tolerance)
+    for name, score in drift.items():
+        check('drift_psi', name, score <= drift_threshold, score, drift_threshold)
     
     # Aggregate results
-    num_failures = sum(1 for r in results if not r.success)
+    num_failures = sum(1 for r in results if not r['success'])
     is_valid = num_failures == 0
     
     # Save validation report
@@ -93,78 +410,198 @@ def validate_data(
         'is_valid': is_valid,
         'num_expectations': len(results),
         'num_failures': num_failures,
-        'results': [r.to_json_dict() for r in results]
+        'results': results,
+        'drift': drift,
+        'reference': reference_profile if reference else None,
+        'profile': profile,
     }
     
     with open(f'{validation_report.path}/report.json', 'w') as f:
-        json.dump(report, f)
+        json.dump(report, f, default=str)
+    with open(f'{validation_report.path}/profile.json', 'w') as f:
+        json.dump(profile, f, default=str)
     
-    return (is_valid, num_failures)
+    # First valid profile becomes the reference; later ones only on request
+    if reference_profile and is_valid and (reference is None or update_reference):
+        reference_fs.makedirs(os.path.dirname(reference_path), exist_ok=True)
+        reference_fs.pipe_file(reference_path, json.dumps(profile, default=str).encode())
+    
+    validation_report.metadata['num_rows'] = num_rows
+    validation_report.metadata['max_drift'] = max(drift.values(), default=0.0)
+    validation_report.metadata['drifted_columns'] = sorted(k for k, v in drift.items() if v > drift_threshold)
+    
+    return cache_store('validate_data', validation_report, cache_entry, (is_valid, num_failures))
 
 
 @component(
     base_image='python:3.10-slim',
-    packages_to_install=['pandas', 'numpy', 'scikit-learn', 'feast']
+    packages_to_install=['pandas', 'numpy', 'scikit-learn', 'feast', 'fsspec', 's3fs'],
+    additional_funcs=[artifact_digest, cache_restore, cache_store]
 )
 def feature_engineering(
     input_dataset: Input[Dataset],
     output_features: Output[Dataset],
     feature_store_path: str = '',
+    batch_rows: int = 0,
+    cache_root: str = '',
+    cache_mode: str = 'use',
+    code_version: str = '',
 ) -> NamedTuple('Outputs', [('num_features', int)]):
-    """Extract and transform features."""
+    """Extract and transform features.
+
+    With batch_rows set, the splits are read in record batches of that size:
+    one pass over train fits the scaler and collects categories, a second
+    over each split transforms and writes batch by batch.
+    """
     import pandas as pd
-    from sklearn.preprocessing import StandardScaler, LabelEncoder
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from sklearn.preprocessing import StandardScaler
     import numpy as np
+    import json
     
-    # Load data
-    train_df = pd.read_parquet(f'{input_dataset.path}/train.parquet')
-    test_df = pd.read_parquet(f'{input_dataset.path}/test.parquet')
+    # Step cache, keyed on this component's code, parameters and inputs
+    cache_entry, cached = cache_restore(
+        'feature_engineering', output_features, cache_root, cache_mode,
+        lambda: [code_version, artifact_digest(input_dataset), feature_store_path, batch_rows]
+    )
+    if cached is not None:
+        return cached
+    
+    # Load data (only the schema when streaming)
+    if batch_rows:
+        train_df = pq.read_schema(f'{input_dataset.path}/train.parquet').empty_table().to_pandas()
+    else:
+        # Frames handed over in-process by run_local are ours to modify
+        frames = getattr(input_dataset, 'frames', {})
+        train_df = frames.pop('train', None)
+        if train_df is None:
+            train_df = pd.read_parquet(f'{input_dataset.path}/train.parquet')
+        test_df = frames.pop('test', None)
+        if test_df is None:
+            test_df = pd.read_parquet(f'{input_dataset.path}/test.parquet')
     
     # Identify feature types
     numeric_cols = train_df.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = train_df.select_dtypes(include=['object', 'category']).columns.tolist()
+    categorical_cols = train_df.select_dtypes(include=['object', 'string', 'category']).columns.tolist()
     
     # Remove target column from features
     target_col = 'target'  # Assuming 'target' is the label column
     if target_col in numeric_cols:
         numeric_cols.remove(target_col)
+    encoded_cols = [col for col in categorical_cols if col != target_col]
     
-    # Scale numeric features
     scaler = StandardScaler()
-    train_df[numeric_cols] = scaler.fit_transform(train_df[numeric_cols])
-    test_df[numeric_cols] = scaler.transform(test_df[numeric_cols])
-    
-    # Encode categorical features
-    encoders = {}
-    for col in categorical_cols:
-        if col != target_col:
-            le = LabelEncoder()
-            train_df[col] = le.fit_transform(train_df[col].astype(str))
-            test_df[col] = le.transform(test_df[col].astype(str))
-            encoders[col] = le
-    
-    # Save processed features
-    train_df.to_parquet(f'{output_features.path}/train_features.parquet')
-    test_df.to_parquet(f'{output_features.path}/test_features.parquet')
+    categories = {col: set() for col in encoded_cols}
+    
+    def batches(split):
+        for batch in pq.ParquetFile(f'{input_dataset.path}/{split}.parquet').iter_batches(batch_size=batch_rows):
+            yield batch.to_pandas()
+    
+    # Categories are compared as strings, so values of mixed types (ints,
+    # bools, strings in one object column) share one vocabulary
+    def collect(df):
+        for col in encoded_cols:
+            categories[col].update(df[col].dropna().astype(str).unique())
+    
+    # Fit scaler and collect categories on the training split
+    if batch_rows:
+        for df in batches('train'):
+            scaler.partial_fit(df[numeric_cols])
+            collect(df)
+    else:
+        scaler.fit(train_df[numeric_cols])
+        collect(train_df)
+    
+    # Category i of a column's vocabulary is encoded as i + 1; values not in
+    # the vocabulary (unseen in training, or missing) go to bucket 0
+    vocabulary = {col: sorted(categories[col]) for col in encoded_cols}
+    
+    def int_dtype(lo, hi):
+        return next(t for t in (np.int8, np.int16, np.int32, np.int64)
+                    if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max)
+    
+    # Other integer columns (the target) are narrowed to the range recorded
+    # in the parquet footers of both splits, when the writer stored one
+    def column_range(col):
+        bounds = []
+        for split in ('train', 'test'):
+            meta = pq.ParquetFile(f'{input_dataset.path}/{split}.parquet').metadata
+            index = meta.schema.names.index(col)
+            for rg in range(meta.num_row_groups):
+                stats = meta.row_group(rg).column(index).statistics
+                if stats is None or not stats.has_min_max:
+                    return None
+                bounds += [stats.min, stats.max]
+        return (min(bounds), max(bounds)) if bounds else None
+    
+    narrow = {}
+    for col in train_df.select_dtypes(include=['integer']).columns.difference(numeric_cols):
+        bounds = column_range(col)
+        if bounds:
+            narrow[col] = int_dtype(*bounds)
+    
+    def encode(values, vocab):
+        # Compared as strings, like the vocabulary; mask() keeps nulls in bucket 0
+        values = values.astype(str).mask(values.isna())
+        return pd.Categorical(values, categories=vocab).codes.astype(int_dtype(0, len(vocab))) + 1
+    
+    def transform(df):
+        df[numeric_cols] = scaler.transform(df[numeric_cols]).astype(np.float32)
+        codes = {col: encode(df[col], vocab) for col, vocab in vocabulary.items()}
+        df = df.assign(**codes)
+        return df.astype(narrow) if narrow else df
+    
+    # Save processed features; input and output memory are summed over batches
+    memory = {'before': 0, 'after': 0}
+    
+    def measured(df, key):
+        memory[key] += int(df.memory_usage(deep=True).sum())
+        return df
+    
+    if batch_rows:
+        for split in ('train', 'test'):
+            path = f'{output_features.path}/{split}_features.parquet'
+            writer = None
+            for df in batches(split):
+                df = measured(transform(measured(df, 'before')), 'after')
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+            if writer is None:
+                pq.write_table(pq.read_schema(f'{input_dataset.path}/{split}.parquet').empty_table(), path)
+            else:
+                writer.close()
+    else:
+        for split, df in (('train', train_df), ('test', test_df)):
+            df = measured(transform(measured(df, 'before')), 'after')
+            df.to_parquet(f'{output_features.path}/{split}_features.parquet')
+            if hasattr(output_features, 'frames'):
+                output_features.frames[split] = df
+    print(f"feature_engineering: {memory['before'] / 2**20:.1f} MiB in, {memory['after'] / 2**20:.1f} MiB out")
     
     # Save transformers
     import pickle
     with open(f'{output_features.path}/scaler.pkl', 'wb') as f:
         pickle.dump(scaler, f)
-    with open(f'{output_features.path}/encoders.pkl', 'wb') as f:
-        pickle.dump(encoders, f)
+    with open(f'{output_features.path}/vocabulary.json', 'w') as f:
+        json.dump(vocabulary, f)
     
     output_features.metadata['numeric_features'] = numeric_cols
     output_features.metadata['categorical_features'] = categorical_cols
+    output_features.metadata['vocabulary_sizes'] = {col: len(vocab) for col, vocab in vocabulary.items()}
+    output_features.metadata['memory_bytes_before'] = memory['before']
+    output_features.metadata['memory_bytes_after'] = memory['after']
     
-    return (len(numeric_cols) + len(categorical_cols),)
+    return cache_store('feature_engineering', output_features, cache_entry, (len(numeric_cols) + len(categorical_cols),))
 
 
 @component(
     base_image='python:3.10-slim',
     packages_to_install=[
-        'pandas', 'numpy', 'scikit-learn', 'xgboost', 
-        'mlflow', 'lightgbm', 'optuna'
+        'pandas', 'numpy', 'scikit-learn>=1.6', 'xgboost', 
+        'mlflow', 'lightgbm', 'optuna', 'psycopg2-binary'
     ]
 )
 def train_model(
@@ -173,14 +610,41 @@ def train_model(
     metrics: Output[Metrics],
     model_type: str = 'xgboost',
     hyperparameters: dict = {},
-    mlflow_tracking_uri: str = ''
+    mlflow_tracking_uri: str = '',
+    tuning_trials: int = 0,
+    tuning_timeout: float = 0.0,
+    tuning_jobs: int = -1,
+    tuning_storage: str = '',
+    tuning_study_name: str = '',
+    cv_jobs: int = -1,
+    final_model: str = 'refit',
 ) -> NamedTuple('Outputs', [('accuracy', float), ('f1_score', float)]):
-    """Train ML model with hyperparameter tuning."""
+    """Train ML model with hyperparameter tuning.
+
+    With tuning_trials or tuning_timeout set, an Optuna study searches the
+    model type's hyperparameters first. Trials run tuning_jobs at a time
+    (-1: one per core) and are pruned fold by fold against the median of
+    earlier trials. Each trial is logged to MLflow as a child run, and the
+    best parameters are used for the final fit. Pointing several pods at the
+    same tuning_storage / tuning_study_name spreads one study across them.
+
+    The 5 cross-validation folds are fitted cv_jobs at a time (-1: one per
+    fold, up to the core count) with the remaining cores split between
+    them as estimator threads. Out-of-fold predictions are written to
+    cv_predictions.parquet. final_model picks what ships: 'refit' on the
+    full training set, 'ensemble' (soft vote of the fold models) or
+    'best_fold' (the fold model with the best validation accuracy).
+    """
+    import os
+    import time
     import pandas as pd
     import numpy as np
-    from sklearn.model_selection import cross_val_score
+    from sklearn.model_selection import StratifiedKFold, cross_validate
+    from sklearn.ensemble import VotingClassifier
+    from sklearn.frozen import FrozenEstimator
     from sklearn.metrics import accuracy_score, f1_score, classification_report
     import mlflow
+    from mlflow.tracking import MlflowClient
     import pickle
     import json
     
@@ -188,8 +652,10 @@ def train_model(
     if mlflow_tracking_uri:
         mlflow.set_tracking_uri(mlflow_tracking_uri)
     
-    # Load features
-    train_df = pd.read_parquet(f'{input_features.path}/train_features.parquet')
+    # Load features, from run_local's in-process handoff when there is one
+    train_df = getattr(input_features, 'frames', {}).pop('train', None)
+    if train_df is None:
+        train_df = pd.read_parquet(f'{input_features.path}/train_features.parquet')
     
     # Prepare data
     target_col = 'target'
@@ -223,29 +689,175 @@ def train_model(
     
     params = {**default_params.get(model_type, {}), **hyperparameters}
     
-    # Initialize model
-    if model_type == 'xgboost':
-        import xgboost as xgb
-        model = xgb.XGBClassifier(**params)
-    elif model_type == 'lightgbm':
-        import lightgbm as lgb
-        model = lgb.LGBMClassifier(**params)
-    else:
-        from sklearn.ensemble import RandomForestClassifier
-        model = RandomForestClassifier(**params)
+    if final_model not in ('refit', 'ensemble', 'best_fold'):
+        raise ValueError(f"final_model must be 'refit', 'ensemble' or 'best_fold', got {final_model!r}")
+    
+    # Tuning and CV score the same folds
+    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=42)
+    folds = list(cv.split(X_train, y_train))
+    
+    def build_model(model_params):
+        if model_type == 'xgboost':
+            import xgboost as xgb
+            return xgb.XGBClassifier(**model_params)
+        elif model_type == 'lightgbm':
+            import lightgbm as lgb
+            return lgb.LGBMClassifier(**{'verbosity': -1, **model_params})
+        else:
+            from sklearn.ensemble import RandomForestClassifier
+            return RandomForestClassifier(**model_params)
+    
+    # Search spaces; anything passed in hyperparameters stays fixed
+    def suggest_params(trial):
+        space = {
+            'xgboost': {
+                'n_estimators': lambda: trial.suggest_int('n_estimators', 50, 500, log=True),
+                'max_depth': lambda: trial.suggest_int('max_depth', 3, 10),
+                'learning_rate': lambda: trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
+                'subsample': lambda: trial.suggest_float('subsample', 0.5, 1.0),
+                'colsample_bytree': lambda: trial.suggest_float('colsample_bytree', 0.5, 1.0),
+                'min_child_weight': lambda: trial.suggest_float('min_child_weight', 1.0, 10.0, log=True),
+            },
+            'lightgbm': {
+                'n_estimators': lambda: trial.suggest_int('n_estimators', 50, 500, log=True),
+                'num_leaves': lambda: trial.suggest_int('num_leaves', 15, 255, log=True),
+                'learning_rate': lambda: trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
+                'min_child_samples': lambda: trial.suggest_int('min_child_samples', 5, 100, log=True),
+                'colsample_bytree': lambda: trial.suggest_float('colsample_bytree', 0.5, 1.0),
+            },
+            'random_forest': {
+                'n_estimators': lambda: trial.suggest_int('n_estimators', 50, 500, log=True),
+                'max_depth': lambda: trial.suggest_int('max_depth', 3, 30),
+                'min_samples_split': lambda: trial.suggest_int('min_samples_split', 2, 20),
+                'max_features': lambda: trial.suggest_categorical('max_features', ['sqrt', 'log2', 0.5]),
+            },
+        }.get(model_type, {})
+        suggested = {name: suggest() for name, suggest in space.items() if name not in hyperparameters}
+        return {**params, **suggested}
+    
+    def tune(parent_run_id):
+        import optuna
+        
+        n_jobs = os.cpu_count() if tuning_jobs < 1 else tuning_jobs
+        client = MlflowClient()
+        experiment_id = mlflow.get_run(parent_run_id).info.experiment_id
+        
+        def objective(trial):
+            trial_params = suggest_params(trial)
+            # Parallel trials each get one core rather than all of them
+            model_params = {**trial_params, 'n_jobs': 1} if n_jobs > 1 else trial_params
+            run = client.create_run(experiment_id, run_name=f'trial-{trial.number}',
+                                    tags={'mlflow.parentRunId': parent_run_id})
+            client.log_batch(run.info.run_id, params=[
+                mlflow.entities.Param(k, str(v)) for k, v in trial_params.items()
+            ])
+            scores = []
+            status = 'FINISHED'
+            try:
+                for fold, (fit_idx, val_idx) in enumerate(folds):
+                    fold_model = build_model(model_params)
+                    fold_model.fit(X_train.iloc[fit_idx], y_train.iloc[fit_idx])
+                    scores.append(accuracy_score(y_train.iloc[val_idx], fold_model.predict(X_train.iloc[val_idx])))
+                    client.log_metric(run.info.run_id, 'cv_accuracy', float(np.mean(scores)), step=fold)
+                    trial.report(float(np.mean(scores)), fold)
+                    if trial.should_prune():
+                        status = 'KILLED'
+                        raise optuna.TrialPruned()
+            except optuna.TrialPruned:
+                raise
+            except Exception:
+                status = 'FAILED'
+                raise
+            finally:
+                state = {'KILLED': 'pruned', 'FAILED': 'failed'}.get(status, 'complete')
+                client.set_tag(run.info.run_id, 'trial_state', state)
+                client.set_terminated(run.info.run_id, status=status)
+            return float(np.mean(scores))
+        
+        study = optuna.create_study(
+            direction='maximize',
+            study_name=tuning_study_name or None,
+            storage=tuning_storage or None,
+            load_if_exists=bool(tuning_storage),
+            sampler=optuna.samplers.TPESampler(seed=42),
+            pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1),
+        )
+        study.optimize(
+            objective,
+            n_trials=tuning_trials or None,
+            timeout=tuning_timeout or None,
+            n_jobs=n_jobs,
+        )
+        states = [t.state for t in study.trials]
+        summary = {
+            'best_cv_accuracy': study.best_value,
+            'best_trial': study.best_trial.number,
+            'trials_complete': states.count(optuna.trial.TrialState.COMPLETE),
+            'trials_pruned': states.count(optuna.trial.TrialState.PRUNED),
+        }
+        return {**params, **study.best_params}, summary
     
     # Train with MLflow tracking
-    with mlflow.start_run():
+    with mlflow.start_run() as parent_run:
+        tuning = None
+        if tuning_trials or tuning_timeout:
+            params, tuning = tune(parent_run.info.run_id)
+            mlflow.log_metrics({f'tuning_{k}': v for k, v in tuning.items()})
+        
         # Log parameters
         mlflow.log_params(params)
+        mlflow.log_param('final_model', final_model)
         
-        # Cross-validation
-        cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='accuracy')
+        # Cross-validation: folds in worker processes, spare cores as estimator
+        # threads, so folds x threads never exceeds the core count
+        cores = os.cpu_count() or 1
+        fold_jobs = min(len(folds), cores if cv_jobs < 1 else cv_jobs)
+        fold_params = params if 'n_jobs' in hyperparameters else {**params, 'n_jobs': max(1, cores // fold_jobs)}
+        cv_started = time.perf_counter()
+        cv_results = cross_validate(
+            build_model(fold_params), X_train, y_train, cv=folds, scoring='accuracy',
+            n_jobs=fold_jobs, return_estimator=True, return_indices=True
+        )
+        cv_seconds = time.perf_counter() - cv_started
+        cv_scores = cv_results['test_score']
+        fold_models = cv_results['estimator']
         mlflow.log_metric('cv_accuracy_mean', cv_scores.mean())
         mlflow.log_metric('cv_accuracy_std', cv_scores.std())
+        mlflow.log_metric('cv_seconds', cv_seconds)
+        for fold, (score, fit_time) in enumerate(zip(cv_scores, cv_results['fit_time'])):
+            mlflow.log_metric('cv_fold_accuracy', score, step=fold)
+            mlflow.log_metric('cv_fold_fit_seconds', fit_time, step=fold)
+        
+        # Out-of-fold predictions
+        oof = []
+        for fold, (fold_model, val_idx) in enumerate(zip(fold_models, cv_results['indices']['test'])):
+            fold_pred = pd.DataFrame({
+                'row': val_idx,
+                'fold': fold,
+                'y_true': y_train.iloc[val_idx].to_numpy(),
+                'y_pred': fold_model.predict(X_train.iloc[val_idx]),
+            })
+            if hasattr(fold_model, 'predict_proba'):
+                proba = fold_model.predict_proba(X_train.iloc[val_idx])
+                for i, label in enumerate(fold_model.classes_):
+                    fold_pred[f'proba_{label}'] = proba[:, i]
+            oof.append(fold_pred)
+        pd.concat(oof).sort_values('row').to_parquet(
+            f'{output_model.path}/cv_predictions.parquet', index=False
+        )
         
-        # Train final model
-        model.fit(X_train, y_train)
+        # Final model
+        if final_model == 'ensemble':
+            # Frozen fold models: fit() only sets up the label encoding
+            model = VotingClassifier(
+                [(f'fold{i}', FrozenEstimator(m)) for i, m in enumerate(fold_models)],
+                voting='soft'
+            ).fit(X_train, y_train)
+        elif final_model == 'best_fold':
+            model = fold_models[int(np.argmax(cv_scores))]
+        else:
+            model = build_model(params)
+            model.fit(X_train, y_train)
         
         # Predictions
         y_pred = model.predict(X_train)
@@ -264,8 +876,12 @@ def train_model(
         mlflow.sklearn.log_model(model, 'model')
         
         # Feature importance
-        if hasattr(model, 'feature_importances_'):
-            importance = dict(zip(X_train.columns, model.feature_importances_))
+        if final_model == 'ensemble' and hasattr(fold_models[0], 'feature_importances_'):
+            importances = np.mean([m.feature_importances_ for m in fold_models], axis=0)
+        else:
+            importances = getattr(model, 'feature_importances_', None)
+        if importances is not None:
+            importance = dict(zip(X_train.columns, importances.tolist()))
             with open(f'{output_model.path}/feature_importance.json', 'w') as f:
                 json.dump(importance, f)
     
@@ -273,16 +889,24 @@ def train_model(
     metrics.log_metric('accuracy', train_accuracy)
     metrics.log_metric('f1_score', train_f1)
     metrics.log_metric('cv_accuracy', cv_scores.mean())
+    metrics.log_metric('cv_seconds', cv_seconds)
+    for fold, (score, fit_time) in enumerate(zip(cv_scores, cv_results['fit_time'])):
+        metrics.log_metric(f'cv_fold{fold}_accuracy', float(score))
+        metrics.log_metric(f'cv_fold{fold}_fit_seconds', float(fit_time))
+    if tuning:
+        for key, value in tuning.items():
+            metrics.log_metric(f'tuning_{key}', value)
     
     output_model.metadata['model_type'] = model_type
     output_model.metadata['hyperparameters'] = params
+    output_model.metadata['final_model'] = final_model
     
     return (train_accuracy, train_f1)
 
 
 @component(
     base_image='python:3.10-slim',
-    packages_to_install=['pandas', 'numpy', 'scikit-learn']
+    packages_to_install=['pandas', 'numpy', 'scikit-learn>=1.6', 'xgboost', 'lightgbm']
 )
 def evaluate_model(
     input_model: Input[Model],
@@ -304,8 +928,10 @@ def evaluate_model(
     with open(f'{input_model.path}/model.pkl', 'rb') as f:
         model = pickle.load(f)
     
-    # Load test data
-    test_df = pd.read_parquet(f'{input_features.path}/test_features.parquet')
+    # Load test data, from run_local's in-process handoff when there is one
+    test_df = getattr(input_features, 'frames', {}).pop('test', None)
+    if test_df is None:
+        test_df = pd.read_parquet(f'{input_features.path}/test_features.parquet')
     
     target_col = 'target'
     X_test = test_df.drop(columns=[target_col])
@@ -403,10 +1029,83 @@ def register_model(
     return f'{model_name}/{result.version}'
 
 
+@component(
+    base_image='python:3.10-slim',
+    packages_to_install=['fsspec', 's3fs']
+)
+def prune_cache(
+    cache_root: str,
+    cache_stats: Output[Metrics],
+    max_age_days: float = 30.0,
+    max_gb: float = 50.0,
+) -> NamedTuple('Outputs', [('entries', int), ('evicted', int)]):
+    """Evict step cache entries by age, then least recently used over max_gb."""
+    import time
+    import fsspec
+    
+    if not cache_root:
+        return (0, 0)
+    
+    fs, base = fsspec.core.url_to_fs(cache_root)
+    now = time.time()
+    
+    def modified(info):
+        value = info.get('mtime') or info.get('LastModified') or info.get('updated')
+        return value.timestamp() if hasattr(value, 'timestamp') else float(value or now)
+    
+    # One entry per <step>/<key>/ directory
+    entries = []
+    for step_dir in fs.ls(base, detail=False) if fs.exists(base) else []:
+        for entry in fs.ls(step_dir, detail=True):
+            if entry['type'] != 'directory':
+                continue
+            files = fs.find(entry['name'], detail=True)
+            manifest = files.get(f"{entry['name']}/_outputs.json")
+            if manifest is None:
+                # Interrupted writes are dropped once they are an hour old
+                started = min((modified(info) for info in files.values()), default=0)
+                entries.append((entry['name'], 0.0 if now - started > 3600 else now, 0))
+                continue
+            try:
+                last_used = float(fs.cat_file(f"{entry['name']}/_last_used"))
+            except FileNotFoundError:
+                last_used = modified(manifest)
+            entries.append((entry['name'], last_used, sum(info['size'] for info in files.values())))
+    
+    max_age = max_age_days * 86400
+    budget = max_gb * 1024 ** 3
+    total = sum(size for _, _, size in entries)
+    evicted = evicted_bytes = 0
+    for path, last_used, size in sorted(entries, key=lambda e: e[1]):
+        if now - last_used <= max_age and total <= budget:
+            break
+        fs.rm(path, recursive=True)
+        total -= size
+        evicted += 1
+        evicted_bytes += size
+    
+    cache_stats.log_metric('cache_entries', len(entries) - evicted)
+    cache_stats.log_metric('cache_bytes', total)
+    cache_stats.log_metric('cache_evicted_entries', evicted)
+    cache_stats.log_metric('cache_evicted_bytes', evicted_bytes)
+    
+    return (len(entries) - evicted, evicted)
+
+
 # ==============================================================================
 # PIPELINE DEFINITION
 # ==============================================================================
 
+def component_digest(comp) -> str:
+    """Hash of a component's image, install step and source, for step cache keys.
+
+    The source includes the step-cache helpers embedded through additional_funcs.
+    """
+    container = comp.component_spec.implementation.container
+    spec = json.dumps([container.image, container.command, container.args])
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+
 @dsl.pipeline(
     name='ML Training Pipeline',
     description='End-to-end ML training pipeline with validation and registration'
@@ -417,25 +1116,67 @@ def ml_training_pipeline(
     model_type: str = 'xgboost',
     mlflow_tracking_uri: str = 'http://mlflow:5000',
     min_accuracy: float = 0.85,
+    tuning_trials: int = 0,
+    tuning_timeout: float = 0.0,
+    tuning_storage: str = '',
+    final_model: str = 'refit',
+    batch_rows: int = 0,
+    reference_profile: str = '',
+    update_reference: bool = False,
+    cache_root: str = '',
+    cache_mode: str = 'use',
+    cache_max_age_days: float = 30.0,
+    cache_max_gb: float = 50.0,
 ):
+    # Evict old step cache entries; runs alongside the pipeline
+    prune_task = prune_cache(cache_root=cache_root, max_age_days=cache_max_age_days, max_gb=cache_max_gb)
+    prune_task.set_caching_options(False)
+    
     # Load data
-    load_task = load_data(data_path=data_path)
+    load_task = load_data(
+        data_path=data_path,
+        batch_rows=batch_rows,
+        cache_root=cache_root,
+        cache_mode=cache_mode,
+        code_version=component_digest(load_data),
+    )
+    # The step cache is keyed on content; Kubeflow's own cache is keyed on
+    # the data_path string and would serve stale data
+    load_task.set_caching_options(False)
     
     # Validate data
-    validate_task = validate_data(input_dataset=load_task.outputs['output_dataset'])
+    validate_task = validate_data(
+        input_dataset=load_task.outputs['output_dataset'],
+        reference_profile=reference_profile,
+        update_reference=update_reference,
+        cache_root=cache_root,
+        cache_mode=cache_mode,
+        code_version=component_digest(validate_data),
+    )
+    validate_task.set_caching_options(False)
     
     # Continue only if data is valid
     with dsl.Condition(validate_task.outputs['is_valid'] == True):
         # Feature engineering
         feature_task = feature_engineering(
-            input_dataset=load_task.outputs['output_dataset']
+            input_dataset=load_task.outputs['output_dataset'],
+            batch_rows=batch_rows,
+            cache_root=cache_root,
+            cache_mode=cache_mode,
+            code_version=component_digest(feature_engineering),
         )
+        feature_task.set_caching_options(False)
         
         # Train model
         train_task = train_model(
             input_features=feature_task.outputs['output_features'],
             model_type=model_type,
-            mlflow_tracking_uri=mlflow_tracking_uri
+            mlflow_tracking_uri=mlflow_tracking_uri,
+            tuning_trials=tuning_trials,
+            tuning_timeout=tuning_timeout,
+            tuning_storage=tuning_storage,
+            tuning_study_name=model_name,
+            final_model=final_model,
         )
         
         # Evaluate model
@@ -453,8 +1194,138 @@ def ml_training_pipeline(
             )
 
 
+# ==============================================================================
+# LOCAL EXECUTION
+# ==============================================================================
+
+def run_local(work_dir=None, **params):
+    """Run ml_training_pipeline's steps in this process.
+
+    Takes the pipeline's parameters (same names and defaults) and follows
+    the same conditions. Artifacts are directories under work_dir. By
+    default that is a fresh /dev/shm directory, or a temporary directory
+    on disk when batch_rows is set, since streamed artifacts in RAM would
+    defeat out-of-core mode. Without batch_rows, each Dataset artifact also
+    carries the DataFrames its producer wrote, and the consumer takes them
+    from there instead of decoding the parquet files again. Returns
+    per-step wall time and each artifact's metadata.
+    """
+    import shutil
+    import tempfile
+    import threading
+    import time
+    from contextlib import redirect_stdout
+
+    defaults = {
+        name: param.default
+        for name, param in inspect.signature(ml_training_pipeline.pipeline_func).parameters.items()
+    }
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise TypeError(f'unknown pipeline parameters: {", ".join(sorted(unknown))}')
+    p = {**defaults, **params}
+
+    owns_work_dir = work_dir is None
+    if owns_work_dir:
+        in_memory = not p['batch_rows'] and os.path.isdir('/dev/shm')
+        work_dir = tempfile.mkdtemp(prefix='ml-pipeline-', dir='/dev/shm' if in_memory else None)
+    timings, artifacts = {}, {}
+
+    def artifact(cls, task, name):
+        path = os.path.join(work_dir, task, name)
+        os.makedirs(path, exist_ok=True)
+        artifacts[f'{task}/{name}'] = a = cls(name=name, uri=path, metadata={})
+        a.frames = {}
+        return a
+
+    def step(task, component, **kwargs):
+        started = time.perf_counter()
+        result = component.python_func(**kwargs)
+        timings[task] = time.perf_counter() - started
+        print(f'{task}: {timings[task]:.2f}s', file=sys.stderr)
+        return result
+
+    cache = dict(cache_root=p['cache_root'], cache_mode=p['cache_mode'])
+    started = time.perf_counter()
+    try:
+        # Step output goes to stderr, leaving stdout for the caller's report
+        with redirect_stdout(sys.stderr):
+            # prune-cache is the one independent branch; it only touches the cache store
+            prune = threading.Thread(target=step, args=('prune-cache', prune_cache), kwargs=dict(
+                cache_root=p['cache_root'], cache_stats=artifact(Metrics, 'prune-cache', 'cache_stats'),
+                max_age_days=p['cache_max_age_days'], max_gb=p['cache_max_gb'],
+            ))
+            prune.start()
+
+            dataset = artifact(Dataset, 'load-data', 'output_dataset')
+            step('load-data', load_data, data_path=p['data_path'], output_dataset=dataset,
+                 batch_rows=p['batch_rows'], code_version=component_digest(load_data), **cache)
+
+            is_valid, _ = step(
+                'validate-data', validate_data, input_dataset=dataset,
+                validation_report=artifact(Dataset, 'validate-data', 'validation_report'),
+                reference_profile=p['reference_profile'], update_reference=p['update_reference'],
+                code_version=component_digest(validate_data), **cache
+            )
+            if is_valid:
+                features = artifact(Dataset, 'feature-engineering', 'output_features')
+                step('feature-engineering', feature_engineering, input_dataset=dataset,
+                     output_features=features, batch_rows=p['batch_rows'],
+                     code_version=component_digest(feature_engineering), **cache)
+
+                model = artifact(Model, 'train-model', 'output_model')
+                step('train-model', train_model, input_features=features, output_model=model,
+                     metrics=artifact(Metrics, 'train-model', 'metrics'),
+                     model_type=p['model_type'], mlflow_tracking_uri=p['mlflow_tracking_uri'],
+                     tuning_trials=p['tuning_trials'], tuning_timeout=p['tuning_timeout'],
+                     tuning_storage=p['tuning_storage'], tuning_study_name=p['model_name'],
+                     final_model=p['final_model'])
+
+                test_accuracy, _ = step(
+                    'evaluate-model', evaluate_model, input_model=model, input_features=features,
+                    metrics=artifact(ClassificationMetrics, 'evaluate-model', 'metrics'),
+                    evaluation_report=artifact(Dataset, 'evaluate-model', 'evaluation_report'),
+                )
+                if test_accuracy >= p['min_accuracy']:
+                    step('register-model', register_model, input_model=model, model_name=p['model_name'],
+                         mlflow_tracking_uri=p['mlflow_tracking_uri'])
+            prune.join()
+    finally:
+        if owns_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'total_seconds': time.perf_counter() - started,
+        'steps': timings,
+        'artifacts': {name: a.metadata for name, a in artifacts.items()},
+    }
+
+
 if __name__ == '__main__':
-    kfp.compiler.Compiler().compile(
-        ml_training_pipeline,
-        'ml_training_pipeline.yaml'
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Compile ml_training_pipeline, or run it in this process with --local.'
     )
+    parser.add_argument('--local', action='store_true', help='run the steps in-process instead of compiling')
+    parser.add_argument('--output', default='ml_training_pipeline.yaml', help='compiled pipeline path')
+    parser.add_argument('--work-dir', help='keep local artifacts here (default: temporary dir in '
+                                           '/dev/shm, or on disk with --batch-rows)')
+    # Pipeline parameters, e.g. --data-path, --batch-rows
+    pipeline_params = inspect.signature(ml_training_pipeline.pipeline_func).parameters
+    for name, param in pipeline_params.items():
+        kind = param.annotation
+        parser.add_argument(
+            '--' + name.replace('_', '-'), dest=name, default=param.default,
+            type=(lambda v: v.lower() in ('1', 'true', 'yes')) if kind is bool else kind,
+            help=f'pipeline parameter (default: {param.default!r})'
+        )
+    args = parser.parse_args()
+
+    if args.local:
+        result = run_local(
+            work_dir=args.work_dir, **{name: getattr(args, name) for name in pipeline_params}
+        )
+        print(json.dumps(result, indent=2, default=str))
+    else:
+        kfp.compiler.Compiler().compile(ml_training_pipeline, args.output)
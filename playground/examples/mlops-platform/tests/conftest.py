@@ -0,0 +1,20 @@
+# The tests call the pipeline components' Python functions directly, on
+# small datasets written under pytest's tmp_path, so no cluster is needed.
+import os
+import sys
+
+import pytest
+
+PIPELINES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pipelines')
+sys.path.insert(0, PIPELINES_DIR)
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    from kfp.dsl import Dataset
+
+    def make(name):
+        path = tmp_path / name
+        path.mkdir()
+        return Dataset(name=name, uri=str(path), metadata={})
+    return make
@@ -0,0 +1,52 @@
+import json
+
+import pandas as pd
+
+from training_pipeline import feature_engineering
+
+
+def features(artifact, train, test, frames=None, batch_rows=0):
+    dataset = artifact('dataset')
+    train.to_parquet(f'{dataset.path}/train.parquet')
+    test.to_parquet(f'{dataset.path}/test.parquet')
+    if frames is not None:
+        dataset.frames = frames
+    out = artifact(f'features-{batch_rows}')
+    feature_engineering.python_func(input_dataset=dataset, output_features=out, batch_rows=batch_rows)
+    with open(f'{out.path}/vocabulary.json') as f:
+        vocabulary = json.load(f)
+    return vocabulary, pd.read_parquet(f'{out.path}/train_features.parquet')
+
+
+def expected_codes(values, vocab):
+    return [0 if v is None else vocab.index(str(v)) + 1 for v in values]
+
+
+def test_bool_column_is_encoded_by_its_string_form(artifact):
+    flags = [True, False, None, True, False, True]
+    train = pd.DataFrame({
+        'x': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+        'flag': pd.Series(flags, dtype=object),
+        'target': [0, 1, 0, 1, 0, 1],
+    })
+    vocabulary, encoded = features(artifact, train, train.copy())
+
+    assert vocabulary['flag'] == ['False', 'True']
+    assert encoded['flag'].tolist() == expected_codes(flags, vocabulary['flag'])
+
+
+def test_mixed_type_column_handed_over_in_memory(artifact):
+    # Parquet cannot hold ints and strings in one column, but run_local hands
+    # DataFrames over in memory, where an object column can mix them
+    mixed = [1, 'a', None, 2.5, 'a', 1]
+    train = pd.DataFrame({
+        'x': [0.1, 0.2, 0.3, 0.4, 0.5, 0.6],
+        'mixed': pd.Series(mixed, dtype=object),
+        'target': [0, 1, 0, 1, 0, 1],
+    })
+    on_disk = train.assign(mixed=train['mixed'].map(lambda v: None if v is None else str(v)))
+    frames = {'train': train, 'test': train.copy()}
+    vocabulary, encoded = features(artifact, on_disk, on_disk.copy(), frames=frames)
+
+    assert vocabulary['mixed'] == ['1', '2.5', 'a']
+    assert encoded['mixed'].tolist() == expected_codes(mixed, vocabulary['mixed'])
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from training_pipeline import load_data
+
+
+def rows(n=2000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'x': rng.normal(size=n),
+        'city': rng.choice(['a', 'b', 'c'], n),
+        'target': rng.integers(0, 2, n),
+    })
+
+
+def split_ids(artifact, data_path, name, batch_rows):
+    out = artifact(name)
+    load_data.python_func(data_path=data_path, output_dataset=out, split_ratio=0.2, batch_rows=batch_rows)
+    return {
+        split: set(pd.read_parquet(f'{out.path}/{split}.parquet')['id'])
+        for split in ('train', 'test')
+    }, out.metadata
+
+
+def test_streaming_split_ignores_batch_size_and_file_layout(artifact, tmp_path):
+    df = rows()
+    one_file = tmp_path / 'one.parquet'
+    df.to_parquet(one_file, row_group_size=300)
+    parts = tmp_path / 'parts'
+    parts.mkdir()
+    df.iloc[:700].to_parquet(parts / 'part-0.parquet', row_group_size=64)
+    df.iloc[700:].to_parquet(parts / 'part-1.parquet')
+
+    first, metadata = split_ids(artifact, str(one_file), 'a', batch_rows=128)
+    assert split_ids(artifact, str(one_file), 'b', batch_rows=1000)[0] == first
+    assert split_ids(artifact, str(parts), 'c', batch_rows=50)[0] == first
+
+    assert first['train'].isdisjoint(first['test'])
+    assert first['train'] | first['test'] == set(df['id'])
+    assert metadata['num_test_samples'] == len(first['test'])
+    assert abs(len(first['test']) / len(df) - 0.2) < 0.03
@@ -0,0 +1,97 @@
+import os
+
+import pandas as pd
+
+from training_pipeline import artifact_digest, component_digest, feature_engineering, load_data
+
+
+def rows(n=200, seed=0):
+    return pd.DataFrame({
+        'x': [float((i * 7 + seed) % 13) for i in range(n)],
+        'city': [('a', 'b', 'c')[i % 3] for i in range(n)],
+        'target': [i % 2 for i in range(n)],
+    })
+
+
+def run_load(artifact, name, data_path, cache_root, **params):
+    out = artifact(name)
+    outputs = load_data.python_func(data_path=data_path, output_dataset=out, cache_root=cache_root, **params)
+    return out, outputs
+
+
+def test_load_data_hits_until_an_input_changes(artifact, tmp_path):
+    data = tmp_path / 'data.parquet'
+    rows().to_parquet(data)
+    cache = str(tmp_path / 'cache')
+
+    miss, outputs = run_load(artifact, 'miss', str(data), cache)
+    hit, cached_outputs = run_load(artifact, 'hit', str(data), cache)
+    assert (miss.metadata['cache'], hit.metadata['cache']) == ('miss', 'hit')
+    assert hit.metadata['cache_key'] == miss.metadata['cache_key']
+    assert tuple(cached_outputs) == tuple(outputs)
+    assert hit.metadata['num_test_samples'] == miss.metadata['num_test_samples']
+    assert sorted(os.listdir(hit.path)) == ['test.parquet', 'train.parquet']
+
+    keys = {miss.metadata['cache_key']}
+    for name, params in [('split', {'split_ratio': 0.3}), ('code', {'code_version': 'v2'}),
+                         ('batches', {'batch_rows': 50})]:
+        changed, _ = run_load(artifact, name, str(data), cache, **params)
+        assert changed.metadata['cache'] == 'miss'
+        keys.add(changed.metadata['cache_key'])
+    assert len(keys) == 4
+
+    rows(seed=1).to_parquet(data)  # new contents, size or mtime
+    changed, _ = run_load(artifact, 'data', str(data), cache)
+    assert changed.metadata['cache'] == 'miss'
+    assert changed.metadata['cache_key'] not in keys
+
+
+def test_cache_modes(artifact, tmp_path):
+    data = tmp_path / 'data.parquet'
+    rows().to_parquet(data)
+    cache = str(tmp_path / 'cache')
+
+    stored, _ = run_load(artifact, 'stored', str(data), cache)
+    refreshed, _ = run_load(artifact, 'refresh', str(data), cache, cache_mode='refresh')
+    assert refreshed.metadata['cache'] == 'miss'
+    assert refreshed.metadata['cache_key'] == stored.metadata['cache_key']
+
+    bypassed, _ = run_load(artifact, 'bypass', str(data), cache, cache_mode='bypass')
+    assert bypassed.metadata['cache'] == 'off'
+    assert 'cache_key' not in bypassed.metadata
+
+    off, _ = run_load(artifact, 'off', str(data), '')
+    assert off.metadata['cache'] == 'off'
+
+
+def test_downstream_key_follows_the_upstream_key(artifact, tmp_path):
+    data = tmp_path / 'data.parquet'
+    rows().to_parquet(data)
+    cache = str(tmp_path / 'cache')
+    dataset, _ = run_load(artifact, 'dataset', str(data), cache)
+
+    def features(name):
+        out = artifact(name)
+        feature_engineering.python_func(input_dataset=dataset, output_features=out, cache_root=cache)
+        return out.metadata
+
+    first = features('first')
+    assert (first['cache'], features('second')['cache']) == ('miss', 'hit')
+
+    # An upstream step that was not cached is identified by its files instead
+    digest = artifact_digest(dataset)
+    del dataset.metadata['cache_key']
+    assert artifact_digest(dataset) != digest
+    uncached = features('uncached')
+    assert uncached['cache'] == 'miss'
+    assert uncached['cache_key'] != first['cache_key']
+
+
+def test_component_digest_covers_the_cache_helpers():
+    digest = component_digest(load_data)
+    assert digest == component_digest(load_data)
+    assert digest != component_digest(feature_engineering)
+
+    # The helpers' source is embedded in the component's program
+    program = ' '.join(load_data.component_spec.implementation.container.command)
+    assert 'def cache_restore(' in program and 'def cache_store(' in program
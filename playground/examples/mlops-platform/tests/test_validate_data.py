@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from training_pipeline import validate_data
+
+
+def data(n=50000, shift=0.0, new_city=False, seed=0):
+    rng = np.random.default_rng(seed)
+    cities = [f'c{k}' for k in range(40)] + (['zz'] * 40 if new_city else [])
+    return pd.DataFrame({
+        'a': rng.normal(shift, 1, n),
+        'id': rng.permutation(n * 4)[:n],
+        'city': rng.choice(cities, n),
+        'target': rng.integers(0, 2, n),
+    })
+
+
+@pytest.fixture
+def validate(artifact, tmp_path):
+    reference = str(tmp_path / 'reference' / 'profile.json')
+    runs = iter(range(100))
+
+    def run(df):
+        n = next(runs)
+        dataset = artifact(f'dataset-{n}')
+        df.to_parquet(f'{dataset.path}/train.parquet', row_group_size=20000)
+        report = artifact(f'report-{n}')
+        is_valid, _ = validate_data.python_func(
+            input_dataset=dataset, validation_report=report, reference_profile=reference)
+        with open(f'{report.path}/report.json') as f:
+            return is_valid, json.load(f), report.metadata
+    return run
+
+
+def test_distinct_estimate(validate):
+    _, report, _ = validate(data())
+    columns = report['profile']['columns']
+
+    assert columns['city']['distinct_estimate'] == 40  # fewer than K: exact
+    assert columns['target']['distinct_estimate'] == 2
+    assert columns['id']['distinct_estimate'] == pytest.approx(50000, rel=0.1)
+    assert columns['a']['distinct_estimate'] == pytest.approx(50000, rel=0.1)
+
+
+def test_psi_against_the_reference_bins(validate, tmp_path):
+    assert validate(data())[0]  # the first valid profile becomes the reference
+    with open(tmp_path / 'reference' / 'profile.json') as f:
+        reference = json.load(f)['columns']['a']
+
+    is_valid, report, metadata = validate(data(shift=1.0, seed=1))
+    shifted = data(shift=1.0, seed=1)['a'].to_numpy()
+    edges = reference['bins']
+    actual = np.bincount(np.searchsorted(edges, shifted, side='right'), minlength=len(edges) + 1) / len(shifted)
+    expected = np.clip(reference['fractions'], 1e-4, None)
+    actual = np.clip(actual, 1e-4, None)
+
+    assert report['drift']['a'] == pytest.approx(np.sum((actual - expected) * np.log(actual / expected)))
+    assert not is_valid
+    assert metadata['drifted_columns'] == ['a']
+
+
+def test_no_drift_on_a_fresh_sample(validate):
+    assert validate(data())[0]
+    is_valid, report, metadata = validate(data(seed=2))
+
+    assert is_valid
+    assert max(report['drift'].values()) < 0.05
+    assert metadata['drifted_columns'] == []
+
+
+def test_new_category_drifts(validate):
+    assert validate(data())[0]
+    is_valid, report, metadata = validate(data(new_city=True, seed=3))
+
+    assert not is_valid
+    assert report['drift']['city'] > 0.3
+    assert 'city' in metadata['drifted_columns']
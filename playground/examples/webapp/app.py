@@ -1,13 +1,52 @@
-from flask import Flask, jsonify
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from flask import Flask, Response, g, has_request_context, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+    multiprocess, CONTENT_TYPE_LATEST
+)
+from contextlib import contextmanager
+import base64
+import collections
+import functools
+import gzip
+import hashlib
+import hmac
+import itertools
+import json
+import math
 import psycopg2
+import random
 import redis
 import os
+import re
+import sys
+import tempfile
+import threading
 import time
+import uuid
+import zlib
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
 
 app = Flask(__name__)
 
 # Prometheus metrics
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all workers
+# (see gunicorn.conf.py). Endpoint labels use the route template, e.g.
+# /cache/<key>, so the number of series stays bounded.
+def parse_buckets(value, default):
+    if not value:
+        return default
+    return tuple(sorted(float(b) for b in value.split(',') if b.strip()))
+
+LATENCY_BUCKETS = parse_buckets(
+    os.environ.get('METRICS_LATENCY_BUCKETS'),
+    Histogram.DEFAULT_BUCKETS
+)
+
 REQUEST_COUNT = Counter(
     'app_requests_total',
     'Total app requests',
@@ -17,46 +56,1158 @@ REQUEST_COUNT = Counter(
 REQUEST_LATENCY = Histogram(
     'app_request_latency_seconds',
     'Request latency in seconds',
-    ['endpoint']
+    ['endpoint'],
+    buckets=LATENCY_BUCKETS
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    'app_db_pool_connections',
+    'Database pool connections by state',
+    ['state'],
+    multiprocess_mode='livesum'
 )
 
+DB_POOL_WAIT = Histogram(
+    'app_db_pool_wait_seconds',
+    'Time spent waiting to check out a database connection',
+    buckets=parse_buckets(
+        os.environ.get('METRICS_DB_POOL_WAIT_BUCKETS'),
+        (.0005, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+    )
+)
+
+DB_POOL_TIMEOUTS = Counter(
+    'app_db_pool_timeouts_total',
+    'Database connection checkouts that timed out'
+)
+
+CACHE_REQUESTS = Counter(
+    'app_cache_requests_total',
+    'Read-through cache lookups by tier and result',
+    ['cache', 'tier', 'result']
+)
+
+CACHE_EVICTIONS = Counter(
+    'app_cache_evictions_total',
+    'Entries dropped from the in-process cache',
+    ['cache', 'reason']
+)
+
+CACHE_INVALIDATIONS = Counter(
+    'app_cache_invalidations_total',
+    'Cache invalidations applied by this worker',
+    ['cache']
+)
+
+CACHE_COALESCED = Counter(
+    'app_cache_coalesced_total',
+    'Cache misses that waited for a load already in flight',
+    ['cache', 'scope']
+)
+
+CACHE_REFRESHES = Counter(
+    'app_cache_refreshes_total',
+    'Background cache reloads started before or after expiry',
+    ['cache', 'reason']
+)
+
+DEPENDENCY_UP = Gauge(
+    'app_dependency_up',
+    'Whether the last background check of a dependency passed',
+    ['dependency'],
+    multiprocess_mode='livemin'
+)
+
+DEPENDENCY_CHECK_LATENCY = Histogram(
+    'app_dependency_check_seconds',
+    'Duration of background dependency checks',
+    ['dependency'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+PROBE_LATENCY = Histogram(
+    'app_probe_latency_seconds',
+    'Time spent answering health probes from cached results',
+    ['probe'],
+    buckets=(.00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01)
+)
+
+# Request tracing
+# Time spent in the database, Redis and JSON encoding is accumulated per request
+# and logged for requests slower than SLOW_REQUEST_THRESHOLD_MS (0 disables).
+SLOW_REQUEST_THRESHOLD_MS = float(os.environ.get('SLOW_REQUEST_THRESHOLD_MS', 500))
+
+@contextmanager
+def span(name):
+    if not has_request_context():
+        yield
+        return
+    # Bound now: a span opened in a streamed body may close after the
+    # request context has been torn down
+    spans = g.setdefault('spans', {})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans[name] = spans.get(name, 0.0) + time.perf_counter() - start
+
+def log_slow_request(req, response, latency):
+    if SLOW_REQUEST_THRESHOLD_MS <= 0 or latency * 1000 < SLOW_REQUEST_THRESHOLD_MS:
+        return
+    spans = {name: round(t * 1000, 3) for name, t in g.get('spans', {}).items()}
+    app.logger.warning(json.dumps({
+        "event": "slow_request",
+        "method": req.method,
+        "path": req.path,
+        "endpoint": route_label(req),
+        "status": response.status_code,
+        "duration_ms": round(latency * 1000, 3),
+        "spans_ms": spans,
+        "other_ms": round(latency * 1000 - sum(spans.values()), 3),
+    }))
+
+
+class TracedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
+app.json = TracedJSONProvider(app)
+
+
+class TracedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        with span('redis'):
+            return super().execute_command(*args, **options)
+
 # Database connection
-def get_db_connection():
+def get_db_connection(connect_timeout=None):
     return psycopg2.connect(
         host=os.environ.get('DB_HOST', 'localhost'),
         database=os.environ.get('DB_NAME', 'myapp'),
         user=os.environ.get('DB_USER', 'postgres'),
-        password=os.environ.get('DB_PASSWORD', 'password')
+        password=os.environ.get('DB_PASSWORD', 'password'),
+        connect_timeout=connect_timeout or int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
     )
 
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of database connections owned by one worker process.
+
+    Idle connections are pinged before reuse once they have been idle for
+    longer than ``health_check_after`` seconds, and connections older than
+    ``max_lifetime`` seconds are replaced instead of being handed out.
+    """
+
+    def __init__(self, connect, size=5, timeout=5.0, max_lifetime=1800.0,
+                 health_check_after=30.0):
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self._idle = collections.deque()  # (conn, created_at, last_used_at)
+        self._in_use = {}                 # conn -> created_at
+        self._opening = 0
+        self._cond = threading.Condition()
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if len(self._in_use) + self._opening < self.size:
+                    entry = None
+                    self._opening += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    DB_POOL_TIMEOUTS.inc()
+                    raise PoolTimeout(
+                        f'no database connection available after {timeout}s'
+                    )
+                self._cond.wait(remaining)
+            if entry is not None:
+                self._opening += 1
+        DB_POOL_WAIT.observe(time.monotonic() - start)
+
+        try:
+            conn, created_at = self._prepare(entry)
+        except Exception:
+            with self._cond:
+                self._opening -= 1
+                self._cond.notify()
+            self._update_gauges()
+            raise
+        with self._cond:
+            self._opening -= 1
+            self._in_use[conn] = created_at
+        self._update_gauges()
+        return conn
+
+    def putconn(self, conn, close=False):
+        with self._cond:
+            created_at = self._in_use.pop(conn, None)
+        if created_at is None:
+            return
+        if not close and not conn.closed:
+            try:
+                # Leave no transaction open on an idle connection
+                conn.rollback()
+            except psycopg2.Error:
+                close = True
+        if close or conn.closed or self._expired(created_at):
+            self._close(conn)
+        else:
+            with self._cond:
+                self._idle.append((conn, created_at, time.monotonic()))
+        with self._cond:
+            self._cond.notify()
+        self._update_gauges()
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), collections.deque()
+        for conn, _, _ in idle:
+            self._close(conn)
+        self._update_gauges()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+            }
+
+    def _prepare(self, entry):
+        if entry is not None:
+            conn, created_at, last_used_at = entry
+            now = time.monotonic()
+            if not conn.closed and not self._expired(created_at):
+                if now - last_used_at < self.health_check_after or self._ping(conn):
+                    return conn, created_at
+            self._close(conn)
+        return self._connect(), time.monotonic()
+
+    def _expired(self, created_at):
+        return time.monotonic() - created_at >= self.max_lifetime
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _update_gauges(self):
+        stats = self.stats()
+        DB_POOL_CONNECTIONS.labels(state='in_use').set(stats['in_use'])
+        DB_POOL_CONNECTIONS.labels(state='idle').set(stats['idle'])
+
+
+_db_pool = None
+_db_pool_pid = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    # One pool per worker process; a pool inherited across fork is discarded
+    global _db_pool, _db_pool_pid
+    if _db_pool is None or _db_pool_pid != os.getpid():
+        with _db_pool_lock:
+            if _db_pool is None or _db_pool_pid != os.getpid():
+                _db_pool = ConnectionPool(
+                    get_db_connection,
+                    size=int(os.environ.get('DB_POOL_SIZE', 5)),
+                    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+                    max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+                    health_check_after=float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30))
+                )
+                _db_pool_pid = os.getpid()
+    return _db_pool
+
+@contextmanager
+def db_connection(timeout=None):
+    pool = get_db_pool()
+    with span('db_pool_wait'):
+        conn = pool.getconn(timeout)
+    try:
+        with span('db'):
+            yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        pool.putconn(conn, close=True)
+        raise
+    except BaseException:
+        pool.putconn(conn)
+        raise
+    else:
+        pool.putconn(conn)
+
 # Redis connection
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 300))
+CACHE_BULK_MAX_KEYS = int(os.environ.get('CACHE_BULK_MAX_KEYS', 1000))
+# Spread default expiries by up to this fraction so keys written together don't expire together
+CACHE_TTL_JITTER = float(os.environ.get('CACHE_TTL_JITTER', 0))
+
+_redis_pool = None
+_redis_pool_lock = threading.Lock()
+
+def get_redis_pool():
+    # redis-py resets the pool's connections itself when it detects a fork
+    global _redis_pool
+    if _redis_pool is None:
+        with _redis_pool_lock:
+            if _redis_pool is None:
+                _redis_pool = redis.BlockingConnectionPool(
+                    host=os.environ.get('REDIS_HOST', 'localhost'),
+                    port=int(os.environ.get('REDIS_PORT', 6379)),
+                    max_connections=int(os.environ.get('REDIS_POOL_SIZE', 10)),
+                    timeout=float(os.environ.get('REDIS_POOL_TIMEOUT', 5)),
+                    socket_timeout=float(os.environ.get('REDIS_SOCKET_TIMEOUT', 5)),
+                    health_check_interval=30,
+                    decode_responses=True
+                )
+    return _redis_pool
+
 def get_redis():
-    return redis.Redis(
-        host=os.environ.get('REDIS_HOST', 'localhost'),
-        port=int(os.environ.get('REDIS_PORT', 6379)),
-        decode_responses=True
-    )
+    return TracedRedis(connection_pool=get_redis_pool())
+
+def default_cache_ttl():
+    if CACHE_TTL_JITTER <= 0:
+        return CACHE_TTL
+    return max(1, round(CACHE_TTL * (1 + random.uniform(-CACHE_TTL_JITTER, CACHE_TTL_JITTER))))
+
+# Read-through caching
+class LRUCache:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, name, maxsize=256, ttl=30.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._data[key]
+                CACHE_EVICTIONS.labels(cache=self.name, reason='expired').inc()
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                CACHE_EVICTIONS.labels(cache=self.name, reason='lru').inc()
+
+    def clear(self):
+        with self._lock:
+            dropped = len(self._data)
+            self._data.clear()
+        if dropped:
+            CACHE_EVICTIONS.labels(cache=self.name, reason='invalidated').inc(dropped)
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one call per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Run ``fn`` once for all concurrent callers; return ``(result, leader)``."""
+        call, leader = self.join(key)
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+        self._run(key, call, fn)
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def join(self, key):
+        """Return ``(call, leader)``; the leader must pass ``call`` to ``finish()``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        return call, leader
+
+    def finish(self, key, call, result=None, error=None):
+        # Only the first finish counts, so a leader may call it more than once
+        with self._lock:
+            if call.done.is_set():
+                return
+            call.result, call.error = result, error
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call.done.set()
+
+    def do_background(self, key, fn):
+        """Start ``fn`` in a thread unless a call for ``key`` is already running."""
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+        threading.Thread(target=self._run, args=(key, call, fn), daemon=True).start()
+        return True
+
+    def _run(self, key, call, fn):
+        try:
+            result = fn()
+        except Exception as e:
+            self.finish(key, call, error=e)
+        else:
+            self.finish(key, call, result)
+
+
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class TieredCacheBase:
+    """Tier bookkeeping shared by TieredCache and asgi_app.AsyncTieredCache.
+
+    Holds the local LRU, the Redis key and entry format, the expiry and
+    early-refresh policy and the invalidation version; subclasses do the
+    Redis I/O and run the loads.
+    """
+
+    def __init__(self, name, ttl=300, stale_ttl=60, local_maxsize=256, local_ttl=30.0,
+                 early_refresh_beta=1.0, distributed_lock=False, lock_ttl=10.0,
+                 lock_wait=5.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local = LRUCache(name, local_maxsize, local_ttl)
+        self.early_refresh_beta = early_refresh_beta
+        self.distributed_lock = distributed_lock
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.version_key = f'cache:{name}:version'
+        self.channel = f'cache:{name}:invalidate'
+        self._version = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _freshness(self, entry, now):
+        """Return 'fresh', 'early' (refresh ahead of expiry), 'stale' or 'expired'."""
+        expires_at, delta = entry[1], entry[2]
+        if now >= expires_at + self.stale_ttl:
+            return 'expired'
+        if now >= expires_at:
+            return 'stale'
+        if self._refresh_early(expires_at, delta, now):
+            return 'early'
+        return 'fresh'
+
+    def _refresh_early(self, expires_at, delta, now):
+        # XFetch: -log(U) is exponentially distributed, so refreshes spread out
+        # ahead of expiry instead of all landing on it
+        if self.early_refresh_beta <= 0 or delta <= 0:
+            return False
+        gap = -delta * self.early_refresh_beta * math.log(1.0 - random.random())
+        return now + gap >= expires_at
+
+    def _new_entry(self, value, delta):
+        return (value, time.time() + self.ttl, delta, content_etag(value))
+
+    def _redis_ttl(self):
+        return int(math.ceil(self.ttl + self.stale_ttl))
+
+    def _set_local(self, key, entry, generation):
+        with self._lock:
+            if generation == self._generation:
+                self.local.set(key, entry, ttl=entry[1] + self.stale_ttl - time.time())
+
+    @staticmethod
+    def _encode(entry):
+        value, expires_at, delta, etag = entry
+        return f'{expires_at:.3f}|{delta:.6f}|{etag}|{value}'
+
+    @staticmethod
+    def _decode(raw):
+        if raw is None:
+            return None
+        try:
+            expires_at, delta, etag, value = raw.split('|', 3)
+            if len(etag) != ETAG_LENGTH:
+                return None
+            return value, float(expires_at), float(delta), etag
+        except ValueError:
+            return None
+
+    def _apply_invalidation(self, version, force=False):
+        version = int(version)
+        with self._lock:
+            if not force and self._version is not None and version <= self._version:
+                return  # already applied, e.g. our own publish
+            self._generation += 1
+            self._version = version
+            self.local.clear()
+        CACHE_INVALIDATIONS.labels(cache=self.name).inc()
+
+    def _redis_key(self, version, key):
+        return f'cache:{self.name}:v{version}:{key}'
+
+    def _lock_key(self, key):
+        return f'cache:{self.name}:lock:{key}'
+
+    def _count(self, tier, result):
+        CACHE_REQUESTS.labels(cache=self.name, tier=tier, result=result).inc()
+
+
+class TieredCache(TieredCacheBase):
+    """Read-through cache: in-process LRU, then Redis, then the caller's loader.
+
+    Redis keys embed a version number stored in Redis. ``invalidate()`` bumps
+    that version, which orphans every Redis entry at once, and publishes it so
+    each worker's listener thread drops its local copies.
+
+    Concurrent misses for a key share one load per worker, and optionally one
+    load across workers via a Redis lock. Entries stay servable for
+    ``stale_ttl`` seconds past expiry while a single background reload runs,
+    and may be refreshed early with a probability that rises as expiry nears
+    (scaled by ``early_refresh_beta`` and the time the last load took).
+    """
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self._flight = SingleFlight()
+        self._listener_pid = None
+
+    def get(self, key, refresh=None):
+        """Return ``(value, tier, etag)``, or ``(None, None, None)`` on a miss.
+
+        Stale entries are still returned (tier suffixed with ``-stale``); if
+        ``refresh`` is given it is used to reload the entry in the background.
+        """
+        entry, tier = self._lookup(key)
+        if entry is None:
+            return None, None, None
+        state = self._freshness(entry, time.time())
+        if state == 'expired':
+            return None, None, None
+        if state != 'fresh' and refresh is not None:
+            self._refresh(key, refresh, state)
+        value, etag = entry[0], entry[3]
+        return value, f'{tier}-stale' if state == 'stale' else tier, etag
+
+    def snapshot(self):
+        """Capture the cache state before loading, to be passed to ``set()``."""
+        return self._generation, self._current_version()
+
+    def set(self, key, value, snapshot, delta=0.0):
+        # A value loaded before an invalidation must not repopulate either tier
+        generation, version = snapshot
+        entry = self._new_entry(value, delta)
+        if version is not None:
+            try:
+                get_redis().set(self._redis_key(version, key), self._encode(entry), ex=self._redis_ttl())
+            except redis.RedisError:
+                pass
+        self._set_local(key, entry, generation)
+        return entry
+
+    def get_or_load(self, key, loader):
+        value, tier, etag = self.get(key, refresh=loader)
+        if value is not None:
+            return value, tier, etag
+        (value, etag), leader = self._flight.do(key, lambda: self._load(key, loader))
+        if not leader:
+            CACHE_COALESCED.labels(cache=self.name, scope='worker').inc()
+        return value, 'miss' if leader else 'coalesced', etag
+
+    def begin_load(self, key):
+        """Claim the load of ``key`` for a caller that produces the value itself.
+
+        Returns ``(call, leader)``. The leader must hand the value, or None if
+        it has none to share, to ``end_load()``; the others ``wait_for_load()``.
+        """
+        call, leader = self._flight.join(key)
+        if not leader:
+            CACHE_COALESCED.labels(cache=self.name, scope='worker').inc()
+        return call, leader
+
+    def end_load(self, key, call, value=None, snapshot=None, delta=0.0, error=None, etag=None):
+        # With an etag the value is already cached and is only handed to the waiters
+        if value is not None and etag is None:
+            etag = self.set(key, value, snapshot, delta)[3]
+        self._flight.finish(key, call, None if value is None else (value, etag), error)
+
+    def wait_for_load(self, call, timeout=None):
+        """Return the leader's ``(value, etag)``, or None if it shared nothing in time."""
+        if not call.done.wait(self.lock_wait if timeout is None else timeout):
+            return None
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def invalidate(self):
+        r = get_redis()
+        version = r.incr(self.version_key)
+        r.publish(self.channel, version)
+        self._apply_invalidation(version)
+        return version
+
+    def _lookup(self, key):
+        self._ensure_listener()
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count('local', 'hit')
+            return entry, 'local'
+        self._count('local', 'miss')
+
+        generation, version = self.snapshot()
+        if version is not None:
+            try:
+                entry = self._decode(get_redis().get(self._redis_key(version, key)))
+            except redis.RedisError:
+                entry = None
+            if entry is not None:
+                self._count('redis', 'hit')
+                self._set_local(key, entry, generation)
+                return entry, 'redis'
+        self._count('redis', 'miss')
+        return None, None
+
+    def _refresh(self, key, loader, reason):
+        def reload():
+            try:
+                return self._load(key, loader)
+            except Exception as e:
+                app.logger.warning('background refresh of %s:%s failed: %s', self.name, key, e)
+                raise
+
+        if self._flight.do_background(key, reload):
+            CACHE_REFRESHES.labels(cache=self.name, reason=reason).inc()
+
+    def _load(self, key, loader):
+        snapshot = self.snapshot()
+        if not self.distributed_lock or snapshot[1] is None:
+            return self._load_and_store(key, loader, snapshot)
+
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        try:
+            acquired = get_redis().set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except redis.RedisError:
+            acquired = True  # Redis is unavailable; load without the lock
+            token = None
+        if not acquired:
+            # Another worker holds the lock: wait for it to publish the value
+            CACHE_COALESCED.labels(cache=self.name, scope='cluster').inc()
+            value = self._wait_for_peer(key, snapshot)
+            if value is not None:
+                return value
+            return self._load_and_store(key, loader, snapshot)
+        try:
+            return self._load_and_store(key, loader, snapshot)
+        finally:
+            if token is not None:
+                try:
+                    get_redis().eval(_RELEASE_LOCK, 1, lock_key, token)
+                except redis.RedisError:
+                    pass
+
+    def _wait_for_peer(self, key, snapshot):
+        generation, version = snapshot
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            try:
+                entry = self._decode(get_redis().get(self._redis_key(version, key)))
+            except redis.RedisError:
+                return None
+            if entry is not None and entry[1] > time.time():
+                self._set_local(key, entry, generation)
+                return entry[0], entry[3]
+        return None
+
+    def _load_and_store(self, key, loader, snapshot):
+        start = time.monotonic()
+        value = loader()
+        entry = self.set(key, value, snapshot, delta=time.monotonic() - start)
+        return value, entry[3]
+
+    def _current_version(self):
+        if self._version is None:
+            try:
+                self._version = int(get_redis().get(self.version_key) or 0)
+            except redis.RedisError:
+                return None
+        return self._version
+
+    def _ensure_listener(self):
+        # One listener thread per worker process, started after fork
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(
+            target=self._listen, name=f'cache-{self.name}-invalidations', daemon=True
+        ).start()
+
+    def _listen(self):
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Messages may have been missed while disconnected
+                self._apply_invalidation(get_redis().get(self.version_key) or 0, force=True)
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        self._apply_invalidation(message['data'])
+            except (redis.RedisError, ValueError):
+                time.sleep(1)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+
+def env_flag(name, default='false'):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes')
+
+USERS_CACHE_OPTIONS = dict(
+    ttl=int(os.environ.get('USERS_CACHE_TTL', 300)),
+    stale_ttl=int(os.environ.get('USERS_CACHE_STALE_TTL', 60)),
+    local_maxsize=int(os.environ.get('USERS_CACHE_LOCAL_SIZE', 256)),
+    local_ttl=float(os.environ.get('USERS_CACHE_LOCAL_TTL', 30)),
+    early_refresh_beta=float(os.environ.get('USERS_CACHE_EARLY_REFRESH_BETA', 1.0)),
+    distributed_lock=env_flag('USERS_CACHE_DISTRIBUTED_LOCK'),
+    lock_ttl=float(os.environ.get('USERS_CACHE_LOCK_TTL', 10)),
+    lock_wait=float(os.environ.get('USERS_CACHE_LOCK_WAIT', 5))
+)
+users_cache = TieredCache('users', **USERS_CACHE_OPTIONS)
+
+# Conditional GET and compression
+ETAG_LENGTH = 32
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+
+# Compressed bodies keyed by (etag, encoding); the etag pins the exact content
+_compressed_bodies = LRUCache(
+    'compressed', maxsize=int(os.environ.get('COMPRESS_CACHE_SIZE', 64)), ttl=300
+)
+
+def content_etag(body):
+    # Strong validator: 128-bit BLAKE2b digest of the exact body
+    if isinstance(body, str):
+        body = body.encode()
+    return hashlib.blake2b(body, digest_size=ETAG_LENGTH // 2).hexdigest()
+
+def negotiate_encoding(req):
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return req.accept_encodings.best_match(offered)
+
+def compress_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+def stream_compressor(encoding):
+    """Return ``(compress, flush, finish)`` for one streamed body."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+def compress_stream(chunks, encoding):
+    step, flush, finish = stream_compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            # Flush per chunk so the client can start parsing before the end
+            yield step(chunk) + flush()
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def prepare_json_response(req, response):
+    """Add a strong ETag, answer If-None-Match with 304, and compress."""
+    if (response.mimetype != 'application/json' or response.status_code != 200
+            or req.method not in ('GET', 'HEAD')):
+        return response
+    encoding = negotiate_encoding(req)
+    response.vary.add('Accept-Encoding')
+
+    if response.is_streamed:
+        # Size and content are unknown up front: no ETag, compress on the fly
+        if encoding:
+            response.response = compress_stream(response.response, encoding)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+        return response
+
+    body = response.get_data()
+    etag = response.get_etag()[0] or content_etag(body)
+    if len(body) < COMPRESS_MIN_BYTES:
+        encoding = None
+    # Each encoding is a different representation and needs its own validator
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    response.make_conditional(req)
+    if response.status_code == 304 or encoding is None:
+        return response
+
+    response.set_data(compressed_body(body, etag, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def compressed_body(body, etag, encoding):
+    compressed = _compressed_bodies.get((etag, encoding))
+    if compressed is None:
+        with span('compress'):
+            compressed = compress_body(body, encoding)
+        _compressed_bodies.set((etag, encoding), compressed)
+    return compressed
+
+# Dependency health
+class HealthMonitor:
+    """Checks dependencies on a background thread and keeps the latest results.
+
+    Probes answer from these results, so they never open a connection
+    themselves. A dependency that was healthy is only reported down after
+    ``failure_threshold`` consecutive failed checks, and a result older than
+    ``stale_after`` seconds counts as a failure.
+    """
+
+    def __init__(self, checks, required, interval=5.0, timeout=2.0, failure_threshold=2):
+        self.checks = checks
+        self.required = required
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.stale_after = 3 * interval + timeout * len(checks)
+        self._results = {
+            name: {"healthy": None, "consecutive_failures": 0, "checked_at": None,
+                   "latency_ms": None, "error": None}
+            for name in checks
+        }
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        # One monitor thread per worker process, started after fork. The first
+        # round runs inline, so no probe is answered before a real check; the
+        # gunicorn post_worker_init hook does this before the worker accepts
+        # connections.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._check_all()
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='health-monitor', daemon=True).start()
+
+    def status(self):
+        """Return ``(ready, dependencies)`` from the latest cached checks."""
+        now = time.time()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        for result in results.values():
+            checked_at = result["checked_at"]
+            if checked_at is None:
+                result["status"] = "unknown"
+                continue
+            if now - checked_at > self.stale_after:
+                result["healthy"] = False
+                result["error"] = f'no check for {now - checked_at:.0f}s'
+            result["status"] = "ok" if result["healthy"] else "error"
+            result["age_s"] = round(now - checked_at, 3)
+        ready = all(results[name]["status"] == "ok" for name in self.required)
+        return ready, results
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self._check_all()
+
+    def _check_all(self):
+        for name, check in self.checks.items():
+            self._check(name, check)
+
+    def _check(self, name, check):
+        start = time.perf_counter()
+        try:
+            check(self.timeout)
+            error = None
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        elapsed = time.perf_counter() - start
+        DEPENDENCY_CHECK_LATENCY.labels(dependency=name).observe(elapsed)
+
+        with self._lock:
+            previous = self._results[name]
+            failures = 0 if error is None else previous["consecutive_failures"] + 1
+            healthy = error is None or (
+                previous["healthy"] is True and failures < self.failure_threshold
+            )
+            self._results[name] = {
+                "healthy": healthy,
+                "consecutive_failures": failures,
+                "checked_at": time.time(),
+                "latency_ms": round(elapsed * 1000, 3),
+                "error": error,
+            }
+        DEPENDENCY_UP.labels(dependency=name).set(1 if healthy else 0)
+
+
+_health_db = None
+_health_db_pid = None
+
+def check_postgres(timeout):
+    # Own connection, outside the request pool, so an exhausted pool under
+    # load doesn't read as PostgreSQL being down
+    global _health_db, _health_db_pid
+    if _health_db is None or _health_db.closed or _health_db_pid != os.getpid():
+        _health_db = get_db_connection(connect_timeout=max(1, math.ceil(timeout)))
+        _health_db_pid = os.getpid()
+    try:
+        cur = _health_db.cursor()
+        cur.execute('SET LOCAL statement_timeout = %s', (int(timeout * 1000),))
+        cur.execute('SELECT 1')
+        cur.close()
+        _health_db.rollback()
+    except Exception:
+        _health_db.close()
+        _health_db = None
+        raise
+
+_health_redis = None
+
+def check_redis(timeout):
+    # Own client so the check has its own timeouts and doesn't queue behind app traffic
+    global _health_redis
+    if _health_redis is None:
+        _health_redis = redis.Redis(
+            host=os.environ.get('REDIS_HOST', 'localhost'),
+            port=int(os.environ.get('REDIS_PORT', 6379)),
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout
+        )
+    _health_redis.ping()
+
+health_monitor = HealthMonitor(
+    {'postgres': check_postgres, 'redis': check_redis},
+    required=[d.strip() for d in os.environ.get('HEALTH_REQUIRED', 'postgres').split(',') if d.strip()],
+    interval=float(os.environ.get('HEALTH_CHECK_INTERVAL', 5)),
+    timeout=float(os.environ.get('HEALTH_CHECK_TIMEOUT', 2)),
+    failure_threshold=int(os.environ.get('HEALTH_FAILURE_THRESHOLD', 2))
+)
+
+# On-demand profiling
+# POST /debug/profile samples every thread of the worker that receives it for
+# N seconds in the background and writes a collapsed-stack file (one
+# "thread;outer;...;inner count" line per stack, the input format of
+# flamegraph.pl and speedscope). Any worker can then serve the file from the
+# shared PROFILE_DIR. The routes return 404 unless DEBUG_TOKEN is set.
+DEBUG_TOKEN = os.environ.get('DEBUG_TOKEN', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'webapp-profiles'))
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 60))
+PROFILE_ID_RE = re.compile(r'^[0-9]+-[0-9]+$')
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads at a fixed interval."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+
+    def run(self, duration):
+        own = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f'thread-{thread_id}'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+_profile_lock = threading.Lock()
+
+def start_profile(seconds, interval):
+    """Start a background profile of this worker; return its id, or None if one is running."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_id = f'{os.getpid()}-{int(time.time() * 1000)}'
+        running = os.path.join(PROFILE_DIR, f'{profile_id}.running')
+        open(running, 'w').close()
+    except BaseException:
+        _profile_lock.release()
+        raise
+
+    def run():
+        try:
+            profiler = SamplingProfiler(interval)
+            profiler.run(seconds)
+            path = os.path.join(PROFILE_DIR, f'{profile_id}.collapsed')
+            with open(path + '.tmp', 'w') as f:
+                f.write(profiler.collapsed())
+            os.replace(path + '.tmp', path)
+        finally:
+            os.remove(running)
+            _profile_lock.release()
+
+    threading.Thread(target=run, name='profiler', daemon=True).start()
+    return profile_id
+
+def debug_protected(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not DEBUG_TOKEN:
+            return jsonify({"error": "not found"}), 404
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode(), DEBUG_TOKEN.encode()):
+            return jsonify({"error": "unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def route_label(req):
+    # Route template rather than the raw path; unmatched paths share one label
+    rule = req.url_rule
+    return rule.rule if rule is not None else '<unmatched>'
+
+def metrics_registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
 
 @app.before_request
 def before_request():
     from flask import request, g
     g.start_time = time.time()
+    g.spans = {}
+    health_monitor.ensure_started()
 
 @app.after_request
 def after_request(response):
     from flask import request, g
+    response = prepare_json_response(request, response)
     latency = time.time() - g.start_time
+    endpoint = route_label(request)
     REQUEST_COUNT.labels(
         method=request.method,
-        endpoint=request.path,
+        endpoint=endpoint,
         status=response.status_code
     ).inc()
-    REQUEST_LATENCY.labels(endpoint=request.path).observe(latency)
+    REQUEST_LATENCY.labels(endpoint=endpoint).observe(latency)
+    log_slow_request(request, response, latency)
     return response
 
 @app.route('/metrics')
 def metrics():
-    return generate_latest(), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+    return generate_latest(metrics_registry()), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+@app.route('/debug/profile', methods=['POST'])
+@debug_protected
+def debug_profile_start():
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', 10))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or not 1 <= interval_ms <= 1000:
+        return jsonify({
+            "error": f"seconds must be in (0, {PROFILE_MAX_SECONDS}] and interval_ms in [1, 1000]"
+        }), 400
+
+    profile_id = start_profile(seconds, interval_ms / 1000)
+    if profile_id is None:
+        return jsonify({"error": "a profile is already running in this worker"}), 409
+    return jsonify({
+        "profile": profile_id,
+        "pid": os.getpid(),
+        "seconds": seconds,
+        "interval_ms": interval_ms,
+        "url": f'/debug/profile/{profile_id}'
+    }), 202
+
+@app.route('/debug/profile/<profile_id>')
+@debug_protected
+def debug_profile_result(profile_id):
+    if not PROFILE_ID_RE.match(profile_id):
+        return jsonify({"error": "invalid profile id"}), 400
+    path = os.path.join(PROFILE_DIR, f'{profile_id}.collapsed')
+    if os.path.exists(path):
+        with open(path) as f:
+            return Response(f.read(), mimetype='text/plain')
+    if os.path.exists(os.path.join(PROFILE_DIR, f'{profile_id}.running')):
+        return jsonify({"profile": profile_id, "status": "running"}), 202
+    return jsonify({"error": "unknown profile"}), 404
 
 @app.route('/')
 def index():
@@ -70,37 +1221,236 @@ def index():
 def health():
     return jsonify({"status": "ok"})
 
+def readiness():
+    """Return the ``/ready`` payload and status from the monitor's cached results."""
+    start = time.perf_counter()
+    is_ready, dependencies = health_monitor.status()
+    PROBE_LATENCY.labels(probe='ready').observe(time.perf_counter() - start)
+    if not is_ready:
+        message = '; '.join(
+            f'{name}: {dependencies[name]["error"] or dependencies[name]["status"]}'
+            for name in health_monitor.required
+            if dependencies[name]["status"] != "ok"
+        )
+        return {"status": "error", "message": message}, 503
+    return {"status": "ready"}, 200
+
+def dependencies_report():
+    """Return the ``/health/dependencies`` payload and status."""
+    start = time.perf_counter()
+    is_ready, dependencies = health_monitor.status()
+    PROBE_LATENCY.labels(probe='dependencies').observe(time.perf_counter() - start)
+    if is_ready:
+        status = "ok" if all(d["status"] == "ok" for d in dependencies.values()) else "degraded"
+    else:
+        status = "error"
+    return {
+        "status": status,
+        "required": health_monitor.required,
+        "dependencies": dependencies
+    }, 200 if is_ready else 503
+
 @app.route('/ready')
 def ready():
-    # Check database
+    payload, status = readiness()
+    return jsonify(payload), status
+
+@app.route('/health/dependencies')
+def health_dependencies():
+    payload, status = dependencies_report()
+    return jsonify(payload), status
+
+USERS_PAGE_SIZE = int(os.environ.get('USERS_PAGE_SIZE', 100))
+USERS_PAGE_MAX = int(os.environ.get('USERS_PAGE_MAX', 1000))
+USERS_STREAM_CHUNK = int(os.environ.get('USERS_STREAM_CHUNK', 1000))
+# A streamed /users body is only cached when the whole table fits in this many bytes
+USERS_CACHE_MAX_BYTES = int(os.environ.get('USERS_CACHE_MAX_BYTES', 1024 * 1024))
+
+def user_to_dict(u):
+    return {"id": u[0], "username": u[1], "email": u[2], "created_at": str(u[3])}
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip('=')
+
+def json_body(obj):
+    return app.json.dumps(obj, separators=(',', ':')) + '\n'
+
+def users_json_chunk(rows, first):
+    # One comma-joined slice of the streamed JSON array
+    parts = [app.json.dumps(user_to_dict(u), separators=(',', ':')) for u in rows]
+    return ('' if first else ',') + ','.join(parts)
+
+def cached_json_response(body, tier, etag=None):
+    response = Response(body, mimetype='application/json', headers={'X-Cache': tier})
+    if etag:
+        response.set_etag(etag)
+    return response
+
+def decode_cursor(token):
+    padded = token + '=' * (-len(token) % 4)
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT 1')
-        cur.close()
-        conn.close()
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 503
-    
-    return jsonify({"status": "ready"})
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f'invalid cursor {token!r}')
 
 @app.route('/users')
 def get_users():
+    # ?limit / ?cursor select a keyset page; otherwise the full list is streamed
+    if 'limit' in request.args or 'cursor' in request.args:
+        return get_users_page()
+    return stream_users()
+
+def parse_page_args(args):
+    limit = int(args.get('limit', USERS_PAGE_SIZE))
+    cursor = args.get('cursor')
+    after_id = decode_cursor(cursor) if cursor else 0
+    return max(1, min(limit, USERS_PAGE_MAX)), after_id
+
+def users_page_payload(users, limit):
+    # `users` holds up to limit + 1 rows; the extra row only signals another page
+    has_more = len(users) > limit
+    users = users[:limit]
+    return {
+        "users": [user_to_dict(u) for u in users],
+        "next": encode_cursor(users[-1][0]) if has_more else None
+    }
+
+def get_users_page():
+    try:
+        limit, after_id = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def load_page():
+        with db_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                'SELECT id, username, email, created_at FROM users '
+                'WHERE id > %s ORDER BY id LIMIT %s;',
+                (after_id, limit + 1)
+            )
+            users = cur.fetchall()
+            cur.close()
+        return json_body(users_page_payload(users, limit))
+
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute('SELECT id, username, email, created_at FROM users;')
-        users = cur.fetchall()
+        body, tier, etag = users_cache.get_or_load(f'page:{after_id}:{limit}', load_page)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return cached_json_response(body, tier, etag)
+
+def iter_users_json(chunk_size):
+    # Server-side (named) cursor so only one chunk of rows is held at a time
+    with db_connection() as conn:
+        cur = conn.cursor(name='users_stream')
+        cur.itersize = chunk_size
+        cur.execute('SELECT id, username, email, created_at FROM users ORDER BY id;')
+        rows = cur.fetchmany(chunk_size)
+        yield '['
+        first = True
+        while rows:
+            yield users_json_chunk(rows, first)
+            first = False
+            rows = cur.fetchmany(chunk_size)
+        yield ']\n'
         cur.close()
-        conn.close()
-        
-        return jsonify([
-            {"id": u[0], "username": u[1], "email": u[2], "created_at": str(u[3])}
-            for u in users
-        ])
+
+def load_users_body():
+    # Non-streaming reload used to refresh a cached copy of the full list
+    parts, size = [], 0
+    for chunk in iter_users_json(USERS_STREAM_CHUNK):
+        size += len(chunk)
+        if size > USERS_CACHE_MAX_BYTES:
+            raise ValueError('users table is too large to cache')
+        parts.append(chunk)
+    return ''.join(parts)
+
+def stream_users():
+    cached, tier, etag = users_cache.get('all', refresh=load_users_body)
+    if cached is not None:
+        return cached_json_response(cached, tier, etag)
+
+    # Concurrent misses wait for the one streaming request to finish and
+    # share its body, unless it turns out too large to cache
+    snapshot = users_cache.snapshot()
+    load, leader = users_cache.begin_load('all')
+    if not leader:
+        try:
+            shared = users_cache.wait_for_load(load)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        if shared is not None:
+            return cached_json_response(shared[0], 'coalesced', shared[1])
+
+        def store(body, delta, error=None):
+            if body is not None:
+                users_cache.set('all', body, snapshot, delta)
+
+        return users_stream_response(store)
+
+    # The previous load may have finished between our miss and taking over
+    cached, tier, etag = users_cache.get('all')
+    if cached is not None:
+        users_cache.end_load('all', load, cached, etag=etag)
+        return cached_json_response(cached, tier, etag)
+    return users_stream_response(
+        lambda body, delta, error=None: users_cache.end_load('all', load, body, snapshot, delta, error)
+    )
+
+def users_stream_response(done):
+    """Stream the full list and report it to ``done(body, seconds, error=None)``.
+
+    ``done`` is called once: with the complete body, or with None as soon as
+    the body outgrows USERS_CACHE_MAX_BYTES, the query fails (``error``) or
+    the response is closed before the end.
+    """
+    started = time.monotonic()
+    reported = False
+
+    def report(body, error=None):
+        nonlocal reported
+        if not reported:
+            reported = True
+            done(body, time.monotonic() - started, error=error)
+
+    chunks = iter_users_json(USERS_STREAM_CHUNK)
+    try:
+        # Run the query before committing to a 200 so DB errors still return 500
+        head = next(chunks)
     except Exception as e:
+        report(None, e)
         return jsonify({"error": str(e)}), 500
 
+    def body():
+        # Keep a copy for the cache only while the body stays small
+        buffered, size = [], 0
+        try:
+            for chunk in itertools.chain([head], chunks):
+                if buffered is not None:
+                    buffered.append(chunk)
+                    size += len(chunk)
+                    if size > USERS_CACHE_MAX_BYTES:
+                        buffered = None
+                        report(None)
+                yield chunk
+        finally:
+            chunks.close()
+        report(''.join(buffered) if buffered is not None else None)
+
+    response = cached_json_response(body(), 'miss')
+    # Also covers a body that is closed early, or before it is ever iterated
+    response.call_on_close(lambda: report(None))
+    return response
+
+@app.route('/users/cache/invalidate', methods=['POST'])
+def invalidate_users_cache():
+    # Call after writing to the users table; all workers drop their copies
+    try:
+        version = users_cache.invalidate()
+    except redis.RedisError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"cache": "users", "version": version})
+
 @app.route('/cache/<key>')
 def get_cache(key):
     r = get_redis()
@@ -111,9 +1461,80 @@ def get_cache(key):
 
 @app.route('/cache/<key>/<value>', methods=['POST'])
 def set_cache(key, value):
+    ttl = default_cache_ttl()
     r = get_redis()
-    r.set(key, value, ex=300)  # 5 minute expiry
-    return jsonify({"key": key, "value": value, "ttl": 300})
+    r.set(key, value, ex=ttl)
+    return jsonify({"key": key, "value": value, "ttl": ttl})
+
+def parse_bulk_keys(args):
+    # Accepts ?keys=a,b,c and/or repeated ?keys=a&keys=b
+    keys = [k for arg in args.getlist('keys') for k in arg.split(',') if k]
+    if not keys:
+        raise ValueError('no keys given')
+    if len(keys) > CACHE_BULK_MAX_KEYS:
+        raise ValueError(f'at most {CACHE_BULK_MAX_KEYS} keys per request')
+    return keys
+
+def bulk_get_payload(keys, values):
+    items = [
+        {"key": k, "value": v, "cached": v is not None}
+        for k, v in zip(keys, values)
+    ]
+    hits = sum(1 for item in items if item["cached"])
+    return {"items": items, "hits": hits, "misses": len(items) - hits}
+
+def parse_bulk_items(body):
+    # Body: {"ttl": 300, "items": [{"key": "a", "value": "1", "ttl": 60}, ...]}
+    body = body or {}
+    items = body.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError("body must contain a non-empty 'items' list")
+    if len(items) > CACHE_BULK_MAX_KEYS:
+        raise ValueError(f'at most {CACHE_BULK_MAX_KEYS} keys per request')
+
+    default_ttl = body.get('ttl')
+    entries = []
+    for item in items:
+        if not isinstance(item, dict) or 'key' not in item or 'value' not in item:
+            raise ValueError("each item needs 'key' and 'value'")
+        ttl = item.get('ttl', default_ttl)
+        if ttl is None:
+            ttl = default_cache_ttl()
+        if not isinstance(ttl, int) or isinstance(ttl, bool) or ttl <= 0:
+            raise ValueError(f"invalid ttl for key {item['key']!r}")
+        entries.append((str(item['key']), str(item['value']), ttl))
+    return entries
+
+def bulk_set_payload(entries):
+    return {
+        "stored": len(entries),
+        "items": [{"key": key, "ttl": ttl} for key, _, ttl in entries]
+    }
+
+@app.route('/cache', methods=['GET'])
+def get_cache_bulk():
+    try:
+        keys = parse_bulk_keys(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # One MGET round trip for all keys
+    values = get_redis().mget(keys)
+    return jsonify(bulk_get_payload(keys, values))
+
+@app.route('/cache', methods=['POST'])
+def set_cache_bulk():
+    try:
+        entries = parse_bulk_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    pipe = get_redis().pipeline(transaction=False)
+    for key, value, ttl in entries:
+        pipe.set(key, value, ex=ttl)
+    with span('redis'):
+        pipe.execute()
+    return jsonify(bulk_set_payload(entries))
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=os.environ.get('DEBUG', 'false').lower() == 'true')
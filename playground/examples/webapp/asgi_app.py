@@ -0,0 +1,622 @@
+# Async (ASGI) variant of app.py.
+#
+# Serves the same routes with the same response bodies, but on asyncpg and
+# redis.asyncio, so a slow query parks a coroutine instead of a whole worker:
+#
+#   uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --workers 2
+#
+# Request parsing, payload shapes, Prometheus metrics, ETag/compression
+# helpers and the background health monitor are shared with app.py. The
+# /users cache has its own asyncio implementation that reads and writes the
+# same Redis entries as app.py's, so both apps can share a Redis.
+from quart import Quart, Response, g, jsonify, request
+from quart.wrappers.response import IterableBody
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from contextlib import asynccontextmanager
+import asyncio
+import asyncpg
+import redis
+import redis.asyncio as aioredis
+import os
+import time
+import uuid
+
+from app import (
+    REQUEST_COUNT,
+    REQUEST_LATENCY,
+    DB_POOL_CONNECTIONS,
+    DB_POOL_WAIT,
+    DB_POOL_TIMEOUTS,
+    CACHE_COALESCED,
+    CACHE_REFRESHES,
+    COMPRESS_MIN_BYTES,
+    USERS_CACHE_MAX_BYTES,
+    USERS_CACHE_OPTIONS,
+    USERS_STREAM_CHUNK,
+    _RELEASE_LOCK,
+    PoolTimeout,
+    TieredCacheBase,
+    health_monitor,
+    metrics_registry,
+    route_label,
+    bulk_get_payload,
+    bulk_set_payload,
+    compressed_body,
+    content_etag,
+    default_cache_ttl,
+    dependencies_report,
+    json_body,
+    negotiate_encoding,
+    parse_bulk_items,
+    parse_bulk_keys,
+    parse_page_args,
+    readiness,
+    stream_compressor,
+    users_json_chunk,
+    users_page_payload,
+)
+
+app = Quart(__name__)
+
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+
+db_pool = None
+redis_client = None
+
+
+class AsyncTieredCache(TieredCacheBase):
+    """asyncio counterpart of app.TieredCache on redis.asyncio.
+
+    Same tiers, expiry policy and Redis entries. Concurrent misses for a key
+    await one ``asyncio.Future`` per event loop, and the load runs in its own
+    task so a client that goes away does not cancel it for the others.
+    """
+
+    def __init__(self, name, **options):
+        super().__init__(name, **options)
+        self.redis = None
+        self._flights = {}   # key -> Future of the load in flight
+        self._tasks = set()
+        self._listener = None
+
+    def start(self, client):
+        self.redis = client
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        tasks = [t for t in [self._listener, *self._tasks] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get(self, key, refresh=None):
+        """Return ``(value, tier, etag)``, or ``(None, None, None)``; see TieredCache.get()."""
+        entry, tier = await self._lookup(key)
+        if entry is None:
+            return None, None, None
+        state = self._freshness(entry, time.time())
+        if state == 'expired':
+            return None, None, None
+        if state != 'fresh' and refresh is not None:
+            self._refresh(key, refresh, state)
+        value, etag = entry[0], entry[3]
+        return value, f'{tier}-stale' if state == 'stale' else tier, etag
+
+    async def snapshot(self):
+        return self._generation, await self._current_version()
+
+    async def set(self, key, value, snapshot, delta=0.0):
+        generation, version = snapshot
+        entry = self._new_entry(value, delta)
+        if version is not None:
+            try:
+                await self.redis.set(self._redis_key(version, key), self._encode(entry), ex=self._redis_ttl())
+            except redis.RedisError:
+                pass
+        self._set_local(key, entry, generation)
+        return entry
+
+    async def get_or_load(self, key, loader):
+        """Like TieredCache.get_or_load(), with ``loader`` a coroutine function."""
+        value, tier, etag = await self.get(key, refresh=loader)
+        if value is not None:
+            return value, tier, etag
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._start_flight(key, self._load(key, loader))
+        else:
+            CACHE_COALESCED.labels(cache=self.name, scope='worker').inc()
+        value, etag = await asyncio.shield(flight)
+        return value, 'miss' if leader else 'coalesced', etag
+
+    def begin_load(self, key):
+        """Claim the load of ``key``; see TieredCache.begin_load().
+
+        Returns ``(future, leader)``. The leader hands its value, or None, to
+        ``end_load()``; the others ``await wait_for_load(future)``.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            CACHE_COALESCED.labels(cache=self.name, scope='worker').inc()
+            return flight, False
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        flight.add_done_callback(lambda f: self._end_flight(key, f))
+        return flight, True
+
+    async def end_load(self, key, flight, value=None, snapshot=None, delta=0.0, error=None, etag=None):
+        # With an etag the value is already cached and is only handed to the waiters
+        if value is not None and etag is None:
+            etag = (await self.set(key, value, snapshot, delta))[3]
+        if not flight.done():
+            if error is not None:
+                flight.set_exception(error)
+            else:
+                flight.set_result(None if value is None else (value, etag))
+
+    async def wait_for_load(self, flight, timeout=None):
+        """Return the leader's ``(value, etag)``, or None if it shared nothing in time."""
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(flight), self.lock_wait if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            return None
+
+    async def invalidate(self):
+        version = await self.redis.incr(self.version_key)
+        await self.redis.publish(self.channel, version)
+        self._apply_invalidation(version)
+        return version
+
+    def _start_flight(self, key, load):
+        flight = self._flights[key] = asyncio.create_task(load)
+        flight.add_done_callback(lambda f: self._end_flight(key, f))
+        return flight
+
+    def _end_flight(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            flight.exception()  # retrieved here, or asyncio logs it when nobody waited
+
+    async def _lookup(self, key):
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count('local', 'hit')
+            return entry, 'local'
+        self._count('local', 'miss')
+
+        generation, version = await self.snapshot()
+        if version is not None:
+            try:
+                entry = self._decode(await self.redis.get(self._redis_key(version, key)))
+            except redis.RedisError:
+                entry = None
+            if entry is not None:
+                self._count('redis', 'hit')
+                self._set_local(key, entry, generation)
+                return entry, 'redis'
+        self._count('redis', 'miss')
+        return None, None
+
+    def _refresh(self, key, loader, reason):
+        if key in self._flights:
+            return
+
+        async def reload():
+            try:
+                return await self._load(key, loader)
+            except Exception as e:
+                app.logger.warning('background refresh of %s:%s failed: %s', self.name, key, e)
+                raise
+
+        self._start_flight(key, reload())
+        CACHE_REFRESHES.labels(cache=self.name, reason=reason).inc()
+
+    async def _load(self, key, loader):
+        snapshot = await self.snapshot()
+        if not self.distributed_lock or snapshot[1] is None:
+            return await self._load_and_store(key, loader, snapshot)
+
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+        except redis.RedisError:
+            acquired = True  # Redis is unavailable; load without the lock
+            token = None
+        if not acquired:
+            # Another worker holds the lock: wait for it to publish the value
+            CACHE_COALESCED.labels(cache=self.name, scope='cluster').inc()
+            value = await self._wait_for_peer(key, snapshot)
+            if value is not None:
+                return value
+            return await self._load_and_store(key, loader, snapshot)
+        try:
+            return await self._load_and_store(key, loader, snapshot)
+        finally:
+            if token is not None:
+                try:
+                    await self.redis.eval(_RELEASE_LOCK, 1, lock_key, token)
+                except redis.RedisError:
+                    pass
+
+    async def _wait_for_peer(self, key, snapshot):
+        # The peer is another process, so its value can only be seen in Redis
+        generation, version = snapshot
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            try:
+                entry = self._decode(await self.redis.get(self._redis_key(version, key)))
+            except redis.RedisError:
+                return None
+            if entry is not None and entry[1] > time.time():
+                self._set_local(key, entry, generation)
+                return entry[0], entry[3]
+        return None
+
+    async def _load_and_store(self, key, loader, snapshot):
+        start = time.monotonic()
+        value = await loader()
+        entry = await self.set(key, value, snapshot, delta=time.monotonic() - start)
+        return value, entry[3]
+
+    async def _current_version(self):
+        if self._version is None:
+            try:
+                self._version = int(await self.redis.get(self.version_key) or 0)
+            except redis.RedisError:
+                return None
+        return self._version
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                # Messages may have been missed while disconnected
+                self._apply_invalidation(await self.redis.get(self.version_key) or 0, force=True)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self._apply_invalidation(message['data'])
+            except (redis.RedisError, ValueError):
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.reset()
+
+
+users_cache = AsyncTieredCache('users', **USERS_CACHE_OPTIONS)
+
+@app.before_serving
+async def startup():
+    global db_pool, redis_client
+    # min_size=0 so the server starts even while Postgres is still coming up
+    db_pool = await asyncpg.create_pool(
+        host=os.environ.get('DB_HOST', 'localhost'),
+        database=os.environ.get('DB_NAME', 'myapp'),
+        user=os.environ.get('DB_USER', 'postgres'),
+        password=os.environ.get('DB_PASSWORD', 'password'),
+        min_size=0,
+        max_size=int(os.environ.get('DB_POOL_SIZE', 20)),
+        max_inactive_connection_lifetime=float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+        timeout=float(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        command_timeout=float(os.environ.get('DB_COMMAND_TIMEOUT', 30))
+    )
+    redis_client = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool(
+        host=os.environ.get('REDIS_HOST', 'localhost'),
+        port=int(os.environ.get('REDIS_PORT', 6379)),
+        max_connections=int(os.environ.get('REDIS_POOL_SIZE', 50)),
+        timeout=float(os.environ.get('REDIS_POOL_TIMEOUT', 5)),
+        socket_timeout=float(os.environ.get('REDIS_SOCKET_TIMEOUT', 5)),
+        health_check_interval=30,
+        decode_responses=True
+    ))
+    users_cache.start(redis_client)
+    # First round of dependency checks runs before the first request is served
+    await asyncio.to_thread(health_monitor.ensure_started)
+
+@app.after_serving
+async def shutdown():
+    await users_cache.stop()
+    await db_pool.close()
+    await redis_client.close()
+    await redis_client.connection_pool.disconnect()
+
+def update_pool_gauges():
+    idle = db_pool.get_idle_size()
+    DB_POOL_CONNECTIONS.labels(state='in_use').set(db_pool.get_size() - idle)
+    DB_POOL_CONNECTIONS.labels(state='idle').set(idle)
+
+@asynccontextmanager
+async def db_connection():
+    start = time.monotonic()
+    try:
+        conn = await db_pool.acquire(timeout=DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        DB_POOL_TIMEOUTS.inc()
+        raise PoolTimeout(f'no database connection available after {DB_POOL_TIMEOUT}s')
+    DB_POOL_WAIT.observe(time.monotonic() - start)
+    update_pool_gauges()
+    try:
+        yield conn
+    finally:
+        await db_pool.release(conn)
+        update_pool_gauges()
+
+@app.before_request
+async def before_request():
+    g.start_time = time.time()
+
+async def compress_async_stream(body, encoding):
+    step, flush, finish = stream_compressor(encoding)
+    async with body as chunks:
+        async for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            # Flush per chunk so the client can start parsing before the end
+            yield step(chunk) + flush()
+    yield finish()
+
+async def prepare_json_response(req, response):
+    """Add a strong ETag, answer If-None-Match with 304, and compress."""
+    if (response.mimetype != 'application/json' or response.status_code != 200
+            or req.method not in ('GET', 'HEAD')):
+        return response
+    encoding = negotiate_encoding(req)
+    response.vary.add('Accept-Encoding')
+
+    if not isinstance(response.response, response.data_body_class):
+        # Size and content are unknown up front: no ETag, compress on the fly
+        if encoding:
+            response.response = IterableBody(compress_async_stream(response.response, encoding))
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+        return response
+
+    body = await response.get_data()
+    etag = response.get_etag()[0] or content_etag(body)
+    if len(body) < COMPRESS_MIN_BYTES:
+        encoding = None
+    # Each encoding is a different representation and needs its own validator
+    response.set_etag(f'{etag}-{encoding}' if encoding else etag)
+    await response.make_conditional(req)
+    if response.status_code == 304 or encoding is None:
+        return response
+
+    response.set_data(compressed_body(body, etag, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_request
+async def after_request(response):
+    response = await prepare_json_response(request, response)
+    latency = time.time() - g.start_time
+    endpoint = route_label(request)
+    REQUEST_COUNT.labels(
+        method=request.method,
+        endpoint=endpoint,
+        status=response.status_code
+    ).inc()
+    REQUEST_LATENCY.labels(endpoint=endpoint).observe(latency)
+    return response
+
+@app.route('/metrics')
+async def metrics():
+    return generate_latest(metrics_registry()), 200, {'Content-Type': CONTENT_TYPE_LATEST}
+
+@app.route('/')
+async def index():
+    return jsonify({
+        "status": "healthy",
+        "app": "localops-demo",
+        "version": os.environ.get('APP_VERSION', '1.0.0')
+    })
+
+@app.route('/health')
+async def health():
+    return jsonify({"status": "ok"})
+
+@app.route('/ready')
+async def ready():
+    # Answered from the background monitor's cached results
+    payload, status = readiness()
+    return jsonify(payload), status
+
+@app.route('/health/dependencies')
+async def health_dependencies():
+    payload, status = dependencies_report()
+    return jsonify(payload), status
+
+def cached_json_response(body, tier, etag=None):
+    response = Response(body, mimetype='application/json', headers={'X-Cache': tier})
+    if etag:
+        response.set_etag(etag)
+    return response
+
+@app.route('/users')
+async def get_users():
+    if 'limit' in request.args or 'cursor' in request.args:
+        return await get_users_page()
+    return await stream_users()
+
+async def get_users_page():
+    try:
+        limit, after_id = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async def load_page():
+        async with db_connection() as conn:
+            users = await conn.fetch(
+                'SELECT id, username, email, created_at FROM users '
+                'WHERE id > $1 ORDER BY id LIMIT $2;',
+                after_id, limit + 1
+            )
+        return json_body(users_page_payload(users, limit))
+
+    try:
+        body, tier, etag = await users_cache.get_or_load(f'page:{after_id}:{limit}', load_page)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return cached_json_response(body, tier, etag)
+
+async def iter_users_json(chunk_size):
+    # asyncpg cursors are server-side and need an open transaction
+    async with db_connection() as conn:
+        async with conn.transaction():
+            cur = await conn.cursor('SELECT id, username, email, created_at FROM users ORDER BY id;')
+            rows = await cur.fetch(chunk_size)
+            yield '['
+            first = True
+            while rows:
+                yield users_json_chunk(rows, first)
+                first = False
+                rows = await cur.fetch(chunk_size)
+            yield ']\n'
+
+async def load_users_body():
+    # Non-streaming reload used to refresh a cached copy of the full list
+    parts, size = [], 0
+    async for chunk in iter_users_json(USERS_STREAM_CHUNK):
+        size += len(chunk)
+        if size > USERS_CACHE_MAX_BYTES:
+            raise ValueError('users table is too large to cache')
+        parts.append(chunk)
+    return ''.join(parts)
+
+async def stream_users():
+    cached, tier, etag = await users_cache.get('all', refresh=load_users_body)
+    if cached is not None:
+        return cached_json_response(cached, tier, etag)
+
+    # Concurrent misses await the one streaming request and share its body,
+    # unless it turns out too large to cache
+    snapshot = await users_cache.snapshot()
+    load, leader = users_cache.begin_load('all')
+    if not leader:
+        try:
+            shared = await users_cache.wait_for_load(load)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        if shared is not None:
+            return cached_json_response(shared[0], 'coalesced', shared[1])
+
+        async def store(body, delta, error=None):
+            if body is not None:
+                await users_cache.set('all', body, snapshot, delta)
+
+        return await users_stream_response(store)
+
+    # The previous load may have finished between our miss and taking over
+    cached, tier, etag = await users_cache.get('all')
+    if cached is not None:
+        await users_cache.end_load('all', load, cached, etag=etag)
+        return cached_json_response(cached, tier, etag)
+
+    async def share(body, delta, error=None):
+        await users_cache.end_load('all', load, body, snapshot, delta, error)
+
+    return await users_stream_response(share)
+
+async def users_stream_response(done):
+    """Stream the full list and report it to ``await done(body, seconds, error=None)``.
+
+    As in app.py, ``done`` runs once: with the complete body, or with None
+    once the body outgrows USERS_CACHE_MAX_BYTES, the query fails or the
+    response is closed before the end.
+    """
+    started = time.monotonic()
+    reported = False
+
+    async def report(body, error=None):
+        nonlocal reported
+        if not reported:
+            reported = True
+            await done(body, time.monotonic() - started, error)
+
+    chunks = iter_users_json(USERS_STREAM_CHUNK)
+    try:
+        # Run the query before committing to a 200 so DB errors still return 500
+        head = await chunks.__anext__()
+    except Exception as e:
+        await chunks.aclose()
+        await report(None, e)
+        return jsonify({"error": str(e)}), 500
+
+    async def chunks_with_head():
+        yield head
+        async for chunk in chunks:
+            yield chunk
+
+    async def body():
+        # Keep a copy for the cache only while the body stays small
+        buffered, size = [], 0
+        try:
+            yield ''
+            async for chunk in chunks_with_head():
+                if buffered is not None:
+                    buffered.append(chunk)
+                    size += len(chunk)
+                    if size > USERS_CACHE_MAX_BYTES:
+                        buffered = None
+                        await report(None)
+                yield chunk
+            await report(''.join(buffered) if buffered is not None else None)
+        finally:
+            await chunks.aclose()
+            await report(None)
+
+    stream = body()
+    # Started here, so closing the response always reaches the finally block
+    await stream.__anext__()
+    return cached_json_response(stream, 'miss')
+
+@app.route('/users/cache/invalidate', methods=['POST'])
+async def invalidate_users_cache():
+    # Call after writing to the users table; all workers drop their copies
+    try:
+        version = await users_cache.invalidate()
+    except redis.RedisError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"cache": "users", "version": version})
+
+@app.route('/cache/<key>')
+async def get_cache(key):
+    value = await redis_client.get(key)
+    if value:
+        return jsonify({"key": key, "value": value, "cached": True})
+    return jsonify({"key": key, "value": None, "cached": False}), 404
+
+@app.route('/cache/<key>/<value>', methods=['POST'])
+async def set_cache(key, value):
+    ttl = default_cache_ttl()
+    await redis_client.set(key, value, ex=ttl)
+    return jsonify({"key": key, "value": value, "ttl": ttl})
+
+@app.route('/cache', methods=['GET'])
+async def get_cache_bulk():
+    try:
+        keys = parse_bulk_keys(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    values = await redis_client.mget(keys)
+    return jsonify(bulk_get_payload(keys, values))
+
+@app.route('/cache', methods=['POST'])
+async def set_cache_bulk():
+    try:
+        entries = parse_bulk_items(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key, value, ttl in entries:
+            pipe.set(key, value, ex=ttl)
+        await pipe.execute()
+    return jsonify(bulk_set_payload(entries))
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get('DEBUG', 'false').lower() == 'true')
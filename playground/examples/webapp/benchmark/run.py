@@ -0,0 +1,277 @@
+# Load-test harness for the webapp.
+#
+# Starts app.py under gunicorn against local stand-ins (see standins.py),
+# drives concurrent keep-alive load at each route in turn and prints one JSON
+# report with latency percentiles, throughput and per-worker RSS:
+#
+#   python benchmark/run.py --workers 2 --concurrency 32 --duration 10 > before.json
+#
+# Pass --target to benchmark an already running deployment instead, e.g. the
+# docker compose stack at http://localhost:5000.
+import argparse
+import http.client
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+WEBAPP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(WEBAPP_DIR, 'benchmark'))
+
+DEFAULT_ROUTES = [
+    'GET /',
+    'GET /health',
+    'GET /ready',
+    'GET /users?limit=100',
+    'GET /users',
+    'GET /cache/bench-key',
+    'GET /cache?keys=' + ','.join(f'bench-{i}' for i in range(50)),
+    'POST /cache/bench-key/bench-value',
+]
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Field 4 is the parent pid; the command name may contain spaces
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == master_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def sample_rss(master_pid):
+    if master_pid is None or not os.path.isdir('/proc'):
+        return None
+    return {str(pid): rss_mb(pid) for pid in worker_pids(master_pid)}
+
+
+class Server:
+    """gunicorn running app.py against the SQLite and fakeredis stand-ins."""
+
+    def __init__(self, workers, rows, port):
+        self.workers = workers
+        self.rows = rows
+        self.port = port
+        self.tmpdir = tempfile.mkdtemp(prefix='webapp-bench-')
+        self.proc = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self, timeout=30.0):
+        from standins import seed_database
+
+        db_path = os.path.join(self.tmpdir, 'users.db')
+        seed_database(db_path, self.rows)
+        metrics_dir = os.path.join(self.tmpdir, 'metrics')
+        os.makedirs(metrics_dir)
+        env = dict(
+            os.environ,
+            BENCH_SQLITE_PATH=db_path,
+            PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+            PYTHONPATH=os.pathsep.join([WEBAPP_DIR, os.path.join(WEBAPP_DIR, 'benchmark')]),
+        )
+        # gunicorn.conf.py is picked up from WEBAPP_DIR, as in the image
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-b', f'127.0.0.1:{self.port}',
+             '-w', str(self.workers), 'standins:create_app()'],
+            cwd=WEBAPP_DIR, env=env
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f'gunicorn exited with status {self.proc.returncode}')
+            try:
+                with urllib.request.urlopen(self.url + '/health', timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError(f'app did not become healthy within {timeout}s')
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGTERM)
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def run_route(base_url, route, concurrency, duration, warmup, timeout):
+    method, path = route.split(' ', 1)
+    parsed = urllib.parse.urlsplit(base_url)
+    latencies = [[] for _ in range(concurrency)]
+    statuses = [{} for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_line = threading.Barrier(concurrency + 1)
+    state = {'record_from': None, 'stop_at': None}
+
+    def client(i):
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+        start_line.wait()
+        while True:
+            started = time.perf_counter()
+            if started >= state['stop_at']:
+                break
+            try:
+                conn.request(method, path, headers={'Accept-Encoding': 'gzip'})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+                status = None
+            elapsed = time.perf_counter() - started
+            if started < state['record_from']:
+                continue  # warm-up request
+            if status is None:
+                errors[i] += 1
+                continue
+            latencies[i].append(elapsed)
+            statuses[i][status] = statuses[i].get(status, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    now = time.perf_counter()
+    state['record_from'] = now + warmup
+    state['stop_at'] = now + warmup + duration
+    start_line.wait()
+    for t in threads:
+        t.join()
+
+    samples = sorted(l for per_client in latencies for l in per_client)
+    status_counts = {}
+    for per_client in statuses:
+        for status, count in per_client.items():
+            status_counts[str(status)] = status_counts.get(str(status), 0) + count
+    ms = lambda v: None if v is None else round(v * 1000, 3)
+    return {
+        'route': route,
+        'requests': len(samples),
+        'errors': sum(errors),
+        'status': status_counts,
+        'rps': round(len(samples) / duration, 1),
+        'latency_ms': {
+            'p50': ms(percentile(samples, 50)),
+            'p95': ms(percentile(samples, 95)),
+            'p99': ms(percentile(samples, 99)),
+            'max': ms(samples[-1] if samples else None),
+            'mean': ms(sum(samples) / len(samples) if samples else None),
+        },
+    }
+
+
+def prime(base_url):
+    # Make the cache routes measure hits rather than 404s on a shared Redis
+    from standins import BENCH_CACHE_ITEMS
+
+    body = json.dumps({'items': BENCH_CACHE_ITEMS}).encode()
+    request = urllib.request.Request(
+        base_url + '/cache', data=body, method='POST',
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the webapp and report latency as JSON.')
+    parser.add_argument('--target', help='benchmark a running app instead of starting one')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers (default: 2)')
+    parser.add_argument('--rows', type=int, default=10000, help='users to seed (default: 10000)')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients (default: 16)')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per route')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds per route')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout')
+    parser.add_argument('--route', action='append', dest='routes', metavar='"METHOD /path"',
+                        help='route to load; repeat for several (default: all app routes)')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.target:
+        base_url, master_pid = args.target.rstrip('/'), None
+    else:
+        server = Server(args.workers, args.rows, args.port)
+        server.start()
+        base_url, master_pid = server.url, server.proc.pid
+
+    try:
+        if args.target:
+            prime(base_url)
+        else:
+            # Let the background health monitors publish their first results
+            time.sleep(0.5)
+        report = {
+            'meta': {
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'target': args.target or 'local-standins',
+                'python': platform.python_version(),
+                'workers': None if args.target else args.workers,
+                'rows': None if args.target else args.rows,
+                'concurrency': args.concurrency,
+                'duration_s': args.duration,
+                'warmup_s': args.warmup,
+            },
+            'rss_mb_start': sample_rss(master_pid),
+            'routes': [],
+        }
+        for route in args.routes or DEFAULT_ROUTES:
+            result = run_route(base_url, route, args.concurrency, args.duration,
+                               args.warmup, args.timeout)
+            result['rss_mb'] = sample_rss(master_pid)
+            report['routes'].append(result)
+            print(f"{route}: {result['rps']} req/s, p99 {result['latency_ms']['p99']} ms",
+                  file=sys.stderr)
+    finally:
+        if server is not None:
+            server.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+# Local stand-ins for the webapp's backing services, used by benchmark/run.py.
+#
+# PostgreSQL is replaced by an SQLite file behind a small psycopg2-shaped
+# adapter and Redis by an in-process fakeredis server, so the app can be
+# benchmarked on a laptop or CI runner with no containers running. Each
+# gunicorn worker loads its own stand-ins through create_app().
+import os
+import sqlite3
+import time
+
+import fakeredis
+
+
+class SQLiteCursor:
+    """Just enough of a psycopg2 cursor for the queries app.py runs."""
+
+    def __init__(self, conn):
+        self._cur = conn.cursor()
+        self.itersize = 2000
+
+    def execute(self, query, params=None):
+        # Session settings such as statement_timeout have no SQLite equivalent
+        if query.lstrip().upper().startswith('SET '):
+            return
+        self._cur.execute(query.replace('%s', '?'), params or ())
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cur.fetchmany(size or self.itersize)
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def close(self):
+        self._cur.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+    """psycopg2-style connection over SQLite; named (server-side) cursors are
+    served by SQLite's own incremental cursor."""
+
+    def __init__(self, path):
+        # The pool hands a connection to one thread at a time, never concurrently
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.closed = 0
+
+    def cursor(self, name=None):
+        return SQLiteCursor(self._conn)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self._conn.close()
+            self.closed = 1
+
+
+def seed_database(path, rows):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE users ('
+        ' id INTEGER PRIMARY KEY,'
+        ' username TEXT UNIQUE NOT NULL,'
+        ' email TEXT UNIQUE NOT NULL,'
+        ' created_at TEXT NOT NULL)'
+    )
+    created_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+    conn.executemany(
+        'INSERT INTO users (id, username, email, created_at) VALUES (?, ?, ?, ?)',
+        ((i, f'user{i}', f'user{i}@example.com', created_at) for i in range(1, rows + 1))
+    )
+    conn.commit()
+    conn.close()
+
+
+# Keys the benchmark's cache routes read; every worker's fake Redis starts with them
+BENCH_CACHE_ITEMS = [{'key': f'bench-{i}', 'value': str(i)} for i in range(50)] + [
+    {'key': 'bench-key', 'value': 'bench-value'}
+]
+
+
+def create_app():
+    """Gunicorn entry point: the real app wired to the local stand-ins."""
+    import app as webapp
+
+    db_path = os.environ['BENCH_SQLITE_PATH']
+    fake_redis = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    fake_redis.mset({item['key']: item['value'] for item in BENCH_CACHE_ITEMS})
+
+    webapp.get_db_connection = lambda connect_timeout=None: SQLiteConnection(db_path)
+    webapp.get_redis = lambda: fake_redis
+    webapp._health_redis = fake_redis
+    return webapp.app
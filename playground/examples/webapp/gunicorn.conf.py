@@ -0,0 +1,31 @@
+# Gunicorn settings, read automatically from the working directory.
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+
+# One thread per pooled PostgreSQL connection: with the default sync worker
+# only one request runs at a time and the rest of the pool sits idle
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', os.environ.get('DB_POOL_SIZE', 5)))
+
+def on_starting(server):
+    # Start from an empty directory so a previous run's counters don't leak in
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges from the aggregated /metrics view
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
+
+def post_worker_init(worker):
+    # Check dependencies before the worker accepts connections, so its first
+    # /ready answers from a real check rather than "unknown"
+    import app
+    app.health_monitor.ensure_started()
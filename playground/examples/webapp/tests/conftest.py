@@ -0,0 +1,30 @@
+# The tests run app.py against the benchmark's local stand-ins (SQLite for
+# PostgreSQL, fakeredis for Redis), so no services need to be running.
+import os
+import sys
+
+import pytest
+
+WEBAPP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [WEBAPP_DIR, os.path.join(WEBAPP_DIR, 'benchmark')]
+
+USERS_ROWS = 250
+
+
+@pytest.fixture(scope='session')
+def webapp(tmp_path_factory):
+    import standins
+
+    db_path = str(tmp_path_factory.mktemp('db') / 'users.db')
+    standins.seed_database(db_path, USERS_ROWS)
+    os.environ['BENCH_SQLITE_PATH'] = db_path
+    standins.create_app()
+    import app
+    return app
+
+
+@pytest.fixture
+def client(webapp):
+    # Each test starts with an empty /users cache
+    webapp.users_cache.invalidate()
+    return webapp.app.test_client()
@@ -0,0 +1,134 @@
+# asgi_app.py against an asyncpg-shaped wrapper over the same SQLite file and
+# an async fakeredis; the app is driven without before_serving, so nothing
+# connects to a real PostgreSQL or Redis.
+import asyncio
+import gzip
+import json
+import os
+import sqlite3
+
+import fakeredis.aioredis
+import pytest
+
+from conftest import USERS_ROWS
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch(self, n):
+        await asyncio.sleep(0.005)  # keep the leader streaming while others arrive
+        rows, self.rows = self.rows[:n], self.rows[n:]
+        return rows
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.db = sqlite3.connect(os.environ['BENCH_SQLITE_PATH'])
+
+    async def fetch(self, query, *args):
+        self.pool.queries.append(query)
+        await asyncio.sleep(0.01)
+        return self.db.execute(query.replace('$1', '?').replace('$2', '?'), args).fetchall()
+
+    def transaction(self):
+        return FakeTransaction()
+
+    async def cursor(self, query):
+        self.pool.queries.append(query)
+        return FakeCursor(self.db.execute(query).fetchall())
+
+
+class FakePool:
+    def __init__(self):
+        self.queries = []
+
+    async def acquire(self, timeout=None):
+        return FakeConnection(self)
+
+    async def release(self, conn):
+        conn.db.close()
+
+    def get_idle_size(self):
+        return 0
+
+    def get_size(self):
+        return 0
+
+
+@pytest.fixture
+def asgi(webapp, monkeypatch):
+    import asgi_app
+
+    monkeypatch.setattr(asgi_app, 'db_pool', FakePool())
+    return asgi_app
+
+
+def run(asgi, scenario):
+    async def main():
+        redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+        asgi.redis_client = redis_client
+        asgi.users_cache.start(redis_client)
+        try:
+            await asgi.users_cache.invalidate()
+            await scenario(asgi.app.test_client())
+        finally:
+            await asgi.users_cache.stop()
+            asgi.redis_client = None
+    asyncio.run(main())
+
+
+def test_concurrent_cold_users_requests_share_one_query(asgi):
+    async def scenario(client):
+        responses = await asyncio.gather(*[client.get('/users') for _ in range(10)])
+        bodies = {await r.get_data() for r in responses}
+
+        assert len(asgi.db_pool.queries) == 1
+        assert sorted(r.headers['X-Cache'] for r in responses) == ['coalesced'] * 9 + ['miss']
+        assert len(bodies) == 1 and len(json.loads(bodies.pop())) == USERS_ROWS
+        assert not asgi.users_cache._flights
+    run(asgi, scenario)
+
+
+def test_concurrent_page_misses_share_one_query(asgi):
+    async def scenario(client):
+        responses = await asyncio.gather(*[client.get('/users?limit=7') for _ in range(10)])
+
+        assert len(asgi.db_pool.queries) == 1
+        assert sorted(r.headers['X-Cache'] for r in responses) == ['coalesced'] * 9 + ['miss']
+        assert len({r.headers['ETag'] for r in responses}) == 1
+        assert (await client.get('/users?limit=7')).headers['X-Cache'] == 'local'
+    run(asgi, scenario)
+
+
+def test_etag_304_and_gzip(asgi):
+    async def scenario(client):
+        plain = await client.get('/users?limit=50')
+        etag = plain.headers['ETag']
+        assert (await client.get('/users?limit=50', headers={'If-None-Match': etag})).status_code == 304
+
+        zipped = await client.get('/users?limit=50', headers={'Accept-Encoding': 'gzip'})
+        assert zipped.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(await zipped.get_data()) == await plain.get_data()
+        assert zipped.headers['ETag'] == etag[:-1] + '-gzip"'
+    run(asgi, scenario)
+
+
+def test_invalidate_forces_a_reload(asgi):
+    async def scenario(client):
+        await client.get('/users?limit=5')
+        assert (await client.get('/users?limit=5')).headers['X-Cache'] == 'local'
+        assert (await client.post('/users/cache/invalidate')).status_code == 200
+        assert (await client.get('/users?limit=5')).headers['X-Cache'] == 'miss'
+        assert len(asgi.db_pool.queries) == 2
+    run(asgi, scenario)
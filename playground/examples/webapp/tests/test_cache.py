@@ -0,0 +1,73 @@
+import pytest
+
+
+class RecordingRedis:
+    """Records which client methods a request calls; a pipeline is one round trip."""
+
+    def __init__(self, client):
+        self._client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        self.calls.append(name)
+        return getattr(self._client, name)
+
+
+@pytest.fixture
+def redis_calls(webapp, client, monkeypatch):
+    recorder = RecordingRedis(webapp.get_redis())
+    monkeypatch.setattr(webapp, 'get_redis', lambda: recorder)
+    return recorder
+
+
+def test_bulk_get_is_one_mget(client, redis_calls):
+    redis_calls._client.mset({'a': '1', 'c': '3'})
+    response = client.get('/cache?keys=a,b&keys=c')
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'items': [
+            {'key': 'a', 'value': '1', 'cached': True},
+            {'key': 'b', 'value': None, 'cached': False},
+            {'key': 'c', 'value': '3', 'cached': True},
+        ],
+        'hits': 2,
+        'misses': 1,
+    }
+    assert redis_calls.calls == ['mget']
+
+
+def test_bulk_set_is_one_pipeline_with_per_key_ttls(client, redis_calls):
+    response = client.post('/cache', json={
+        'ttl': 60,
+        'items': [{'key': 'x', 'value': 1}, {'key': 'y', 'value': 'two', 'ttl': 5}],
+    })
+
+    assert response.status_code == 200
+    assert response.get_json() == {'stored': 2, 'items': [{'key': 'x', 'ttl': 60}, {'key': 'y', 'ttl': 5}]}
+    assert redis_calls.calls == ['pipeline']
+    stored = redis_calls._client
+    assert stored.mget(['x', 'y']) == ['1', 'two']
+    assert 55 <= stored.ttl('x') <= 60 and stored.ttl('y') <= 5
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    {'items': []},
+    {'items': [{'key': 'x'}]},
+    {'items': [{'key': 'x', 'value': 1, 'ttl': 0}]},
+    {'items': [{'key': 'x', 'value': 1, 'ttl': True}]},
+])
+def test_bulk_set_rejects_bad_bodies(client, redis_calls, body):
+    assert client.post('/cache', json=body).status_code == 400
+    assert redis_calls.calls == []
+
+
+def test_bulk_key_limit(webapp, client, redis_calls, monkeypatch):
+    monkeypatch.setattr(webapp, 'CACHE_BULK_MAX_KEYS', 2)
+
+    assert client.get('/cache?keys=a,b,c').status_code == 400
+    assert client.get('/cache').status_code == 400
+    items = [{'key': k, 'value': k} for k in 'abc']
+    assert client.post('/cache', json={'items': items}).status_code == 400
+    assert redis_calls.calls == []
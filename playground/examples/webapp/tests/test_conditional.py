@@ -0,0 +1,62 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+from conftest import USERS_ROWS
+
+PAGE = '/users?limit=50'  # well over COMPRESS_MIN_BYTES
+
+
+def test_etag_and_304(client):
+    response = client.get(PAGE)
+    etag = response.headers['ETag']
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in response.headers
+
+    cached = client.get(PAGE)
+    assert cached.headers['X-Cache'] == 'local'
+    assert cached.headers['ETag'] == etag  # stored with the entry, not rehashed
+
+    not_modified = client.get(PAGE, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+    assert client.get(PAGE, headers={'If-None-Match': '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize('accept, encoding, decompress', [
+    ('gzip', 'gzip', gzip.decompress),
+    ('br', 'br', brotli.decompress),
+    ('gzip, br', 'br', brotli.decompress),
+    ('br;q=0, gzip', 'gzip', gzip.decompress),
+])
+def test_compression_is_negotiated(client, accept, encoding, decompress):
+    plain = client.get(PAGE)
+    response = client.get(PAGE, headers={'Accept-Encoding': accept})
+
+    assert response.headers['Content-Encoding'] == encoding
+    assert decompress(response.get_data()) == plain.get_data()
+    # Each encoding is its own representation with its own validator
+    etag = response.headers['ETag']
+    assert etag == plain.headers['ETag'][:-1] + f'-{encoding}"'
+    assert client.get(PAGE, headers={'Accept-Encoding': accept, 'If-None-Match': etag}).status_code == 304
+    assert client.get(PAGE, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get('/health', headers={'Accept-Encoding': 'gzip, br'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == {'status': 'ok'}
+
+
+def test_streamed_users_body_brotli(client):
+    response = client.get('/users', headers={'Accept-Encoding': 'br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert len(json.loads(brotli.decompress(response.get_data()))) == USERS_ROWS
+
+
+def test_errors_get_no_etag(client):
+    response = client.get('/users?cursor=!!', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.fixture
+def debug_client(webapp, client, monkeypatch):
+    monkeypatch.setattr(webapp, 'DEBUG_TOKEN', 'secret')
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer secret'
+    return client
+
+
+def test_failed_profile_setup_releases_the_lock(webapp, debug_client, monkeypatch, tmp_path):
+    # A regular file where the profile directory should be makes setup fail
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    monkeypatch.setattr(webapp, 'PROFILE_DIR', str(blocker / 'profiles'))
+    monkeypatch.setattr(webapp.app, 'testing', False)  # the error becomes a 500
+    assert debug_client.post('/debug/profile?seconds=0.1').status_code == 500
+
+    monkeypatch.setattr(webapp, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    assert debug_client.post('/debug/profile?seconds=0.1').status_code == 202
@@ -0,0 +1,61 @@
+def test_postgres_check_does_not_use_the_request_pool(webapp, client):
+    pool = webapp.get_db_pool()
+    held = [pool.getconn() for _ in range(pool.size)]
+    try:
+        webapp.check_postgres(timeout=0.5)
+    finally:
+        for conn in held:
+            pool.putconn(conn)
+
+
+def test_first_ready_probe_answers_from_a_real_check(webapp, client):
+    assert client.get('/ready').status_code == 200
+    _, dependencies = webapp.health_monitor.status()
+    assert dependencies['postgres']['status'] == 'ok'
+
+
+def test_ready_never_opens_a_connection(webapp, client, monkeypatch):
+    client.get('/ready')  # the monitor has run its first round
+
+    def no_connections(*args, **kwargs):
+        raise AssertionError('/ready opened a database connection')
+
+    monkeypatch.setattr(webapp, 'get_db_connection', no_connections)
+    monkeypatch.setattr(webapp, 'get_db_pool', no_connections)
+    assert client.get('/ready').status_code == 200
+
+
+def flaky_monitor(webapp, outcomes, **options):
+    def check(timeout):
+        if not outcomes.pop(0):
+            raise ConnectionError('refused')
+    return webapp.HealthMonitor({'db': check}, required=['db'], **options)
+
+
+def test_one_failed_check_does_not_flip_readiness(webapp):
+    monitor = flaky_monitor(webapp, [True, False, False, True], failure_threshold=2)
+    monitor._check_all()
+    assert monitor.status()[0]
+
+    monitor._check_all()
+    ready, dependencies = monitor.status()
+    assert ready and dependencies['db']['consecutive_failures'] == 1
+
+    monitor._check_all()
+    ready, dependencies = monitor.status()
+    assert not ready and dependencies['db']['error'] == 'refused'
+
+    monitor._check_all()
+    assert monitor.status()[0]
+
+
+def test_unknown_and_stale_results_are_not_ready(webapp):
+    monitor = flaky_monitor(webapp, [True], interval=1, timeout=1)
+    ready, dependencies = monitor.status()
+    assert not ready and dependencies['db']['status'] == 'unknown'
+
+    monitor._check_all()
+    assert monitor.status()[0]
+    monitor._results['db']['checked_at'] -= monitor.stale_after + 1  # the monitor thread stalled
+    ready, dependencies = monitor.status()
+    assert not ready and dependencies['db']['error'].startswith('no check for')
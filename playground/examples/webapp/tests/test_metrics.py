@@ -0,0 +1,32 @@
+from prometheus_client import REGISTRY
+
+
+def requests_total(endpoint, status):
+    return REGISTRY.get_sample_value(
+        'app_requests_total', {'method': 'GET', 'endpoint': endpoint, 'status': str(status)}
+    ) or 0
+
+
+def test_requests_are_labelled_by_route_template(client):
+    before = requests_total('/cache/<key>', 404)
+    for key in ('metrics-a', 'metrics-b', 'metrics-c'):
+        client.get(f'/cache/{key}')
+    assert requests_total('/cache/<key>', 404) == before + 3
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'endpoint="/cache/<key>"' in body
+    assert 'metrics-a' not in body
+
+
+def test_unmatched_paths_share_one_label(client):
+    before = requests_total('<unmatched>', 404)
+    client.get('/no/such/path')
+    client.get('/another-missing-page')
+    assert requests_total('<unmatched>', 404) == before + 2
+    assert 'no/such/path' not in client.get('/metrics').get_data(as_text=True)
+
+
+def test_latency_buckets_from_the_environment(webapp):
+    default = ('0.1',)
+    assert webapp.parse_buckets('', default) == default
+    assert webapp.parse_buckets('2.5, 0.5,1,', default) == (0.5, 1.0, 2.5)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+
+
+class FakeConnection:
+    def __init__(self, fail_ping=False):
+        self.closed = 0
+        self.fail_ping = fail_ping
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        if self.fail_ping:
+            raise psycopg2.OperationalError('server closed the connection')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+@pytest.fixture
+def make_pool(webapp, opened):
+    def make(**options):
+        def connect():
+            opened.append(FakeConnection())
+            return opened[-1]
+        return webapp.ConnectionPool(connect, **options)
+    return make
+
+
+def test_getconn_times_out_when_the_pool_is_exhausted(webapp, make_pool):
+    pool = make_pool(size=1, timeout=0.05)
+    conn = pool.getconn()
+
+    started = time.monotonic()
+    with pytest.raises(webapp.PoolTimeout):
+        pool.getconn()
+    assert 0.05 <= time.monotonic() - started < 1
+
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+
+
+def test_waiter_gets_the_released_connection(make_pool):
+    pool = make_pool(size=1, timeout=5)
+    conn = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    time.sleep(0.05)
+    pool.putconn(conn)
+    waiter.join(1)
+
+    assert got == [conn]
+
+
+def test_connections_past_max_lifetime_are_replaced(make_pool, opened):
+    pool = make_pool(size=1, max_lifetime=0.05)
+    first = pool.getconn()
+    pool.putconn(first)
+    assert pool.getconn() is first  # still young
+
+    time.sleep(0.06)
+    pool.putconn(first)  # returned after max_lifetime: closed, not kept
+    assert first.closed
+    assert pool.stats() == {'size': 1, 'in_use': 0, 'idle': 0}
+    second = pool.getconn()
+    assert second is not first and opened == [first, second]
+
+
+def test_idle_connection_expiring_in_the_pool_is_replaced(make_pool, opened):
+    pool = make_pool(size=1, max_lifetime=0.05)
+    pool.putconn(pool.getconn())
+    time.sleep(0.06)
+
+    assert pool.getconn() is opened[1]
+    assert opened[0].closed
+
+
+def test_failed_ping_replaces_an_idle_connection(make_pool, opened):
+    pool = make_pool(size=1, health_check_after=0)
+    conn = pool.getconn()
+    conn.fail_ping = True
+    pool.putconn(conn)
+
+    assert pool.getconn() is opened[1]
+    assert conn.closed
+
+
+def test_failed_connect_frees_its_slot(webapp):
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise psycopg2.OperationalError('connection refused')
+        return FakeConnection()
+
+    pool = webapp.ConnectionPool(connect, size=1, timeout=0.05)
+    with pytest.raises(psycopg2.OperationalError):
+        pool.getconn()
+    assert pool.getconn() is not None
@@ -0,0 +1,104 @@
+import concurrent.futures
+import itertools
+import threading
+import time
+
+import pytest
+
+names = itertools.count()
+
+
+@pytest.fixture
+def make_cache(webapp, client):
+    # A fresh name per test keeps entries and version keys apart
+    name = f'test{next(names)}'
+    return lambda **options: webapp.TieredCache(name, **dict({'early_refresh_beta': 0}, **options))
+
+
+def counting_loader():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return f'value-{len(loads)}'
+    return load, loads
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_tiers_then_invalidation(make_cache):
+    cache = make_cache()
+    load, loads = counting_loader()
+
+    assert cache.get_or_load('k', load)[:2] == ('value-1', 'miss')
+    assert cache.get_or_load('k', load)[:2] == ('value-1', 'local')
+    cache.local.clear()
+    assert cache.get_or_load('k', load)[:2] == ('value-1', 'redis')
+
+    cache.invalidate()
+    assert cache.get_or_load('k', load)[:2] == ('value-2', 'miss')
+    assert len(loads) == 2
+
+
+def test_invalidation_reaches_other_workers(make_cache):
+    this, other = make_cache(), make_cache()
+    load, loads = counting_loader()
+    other.get_or_load('k', load)
+    assert other.get('k')[1] == 'local'
+
+    # The listener gets the publish, or reads the new version when it subscribes
+    this.invalidate()
+    wait_until(lambda: other.local.get('k') is None)
+    assert other.get('k') == (None, None, None)
+
+
+def test_load_finishing_after_invalidation_is_not_cached(make_cache):
+    cache = make_cache()
+    snapshot = cache.snapshot()
+    cache.invalidate()  # lands while the load is running
+    cache.set('k', 'old', snapshot)
+
+    assert cache.get('k') == (None, None, None)
+
+
+def test_invalidate_endpoint_drops_cached_users(client):
+    assert client.get('/users?limit=5').headers['X-Cache'] == 'miss'
+    assert client.get('/users?limit=5').headers['X-Cache'] == 'local'
+    assert client.post('/users/cache/invalidate').status_code == 200
+    assert client.get('/users?limit=5').headers['X-Cache'] == 'miss'
+
+
+def test_concurrent_misses_share_one_load(make_cache):
+    cache = make_cache()
+    release = threading.Event()
+    load, loads = counting_loader()
+
+    def slow_load():
+        release.wait(2)
+        return load()
+
+    with concurrent.futures.ThreadPoolExecutor(8) as pool:
+        results = [pool.submit(cache.get_or_load, 'k', slow_load) for _ in range(8)]
+        time.sleep(0.05)  # let every caller join the load
+        release.set()
+        results = [r.result() for r in results]
+
+    assert len(loads) == 1
+    assert sorted(tier for _, tier, _ in results) == ['coalesced'] * 7 + ['miss']
+    assert {value for value, _, _ in results} == {'value-1'}
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(make_cache):
+    cache = make_cache(ttl=0.1, stale_ttl=60)
+    load, loads = counting_loader()
+    cache.get_or_load('k', load)
+    time.sleep(0.15)
+
+    assert cache.get_or_load('k', load)[:2] == ('value-1', 'local-stale')
+    wait_until(lambda: cache.local.get('k')[0] == 'value-2')
+    assert len(loads) == 2
@@ -0,0 +1,89 @@
+import concurrent.futures
+import gzip
+import json
+import time
+
+from conftest import USERS_ROWS
+
+
+def test_streamed_users_body_is_complete_and_cached(client):
+    response = client.get('/users')
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'miss'
+    # Draining the body runs the generator after the request context is gone
+    users = json.loads(response.get_data())
+    assert [u['id'] for u in users] == list(range(1, USERS_ROWS + 1))
+
+    cached = client.get('/users')
+    assert cached.headers['X-Cache'] == 'local'
+    assert json.loads(cached.get_data()) == users
+
+
+def test_streamed_users_body_gzip(client):
+    response = client.get('/users', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    users = json.loads(gzip.decompress(response.get_data()))
+    assert len(users) == USERS_ROWS
+
+
+def pages(client, limit):
+    url, pages = f'/users?limit={limit}', []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.get_json()
+        pages.append([u['id'] for u in page['users']])
+        url = page['next'] and f"/users?limit={limit}&cursor={page['next']}"
+    return pages
+
+
+def test_cursor_walks_every_user_once(client):
+    walked = pages(client, 100)
+    assert [len(p) for p in walked] == [100, 100, 50]
+    assert sum(walked, []) == list(range(1, USERS_ROWS + 1))
+
+
+def test_last_full_page_has_no_next_cursor(client):
+    # USERS_ROWS is a multiple of the limit: no trailing empty page
+    assert [len(p) for p in pages(client, USERS_ROWS // 2)] == [USERS_ROWS // 2] * 2
+
+
+def test_cursor_past_the_end_is_an_empty_page(webapp, client):
+    page = client.get(f'/users?cursor={webapp.encode_cursor(USERS_ROWS)}').get_json()
+    assert page == {'users': [], 'next': None}
+
+
+def test_limit_is_clamped(webapp, client, monkeypatch):
+    monkeypatch.setattr(webapp, 'USERS_PAGE_MAX', 20)
+    assert len(client.get('/users?limit=0').get_json()['users']) == 1
+    assert len(client.get('/users?limit=-5').get_json()['users']) == 1
+    assert len(client.get('/users?limit=1000').get_json()['users']) == 20
+
+
+def test_bad_page_arguments(client):
+    for query in ('cursor=not-base64!', 'cursor=YWJj', 'limit=ten'):  # YWJj is 'abc'
+        response = client.get(f'/users?{query}')
+        assert response.status_code == 400, query
+        assert 'error' in response.get_json()
+
+
+def test_concurrent_cold_users_requests_share_one_query(webapp, client, monkeypatch):
+    queries = []
+    stream = webapp.iter_users_json
+
+    def slow_stream(chunk_size):
+        queries.append(chunk_size)
+        for chunk in stream(chunk_size):
+            time.sleep(0.01)  # keep the leader streaming while the others arrive
+            yield chunk
+
+    monkeypatch.setattr(webapp, 'iter_users_json', slow_stream)
+    monkeypatch.setattr(webapp, 'USERS_STREAM_CHUNK', 10)
+    with concurrent.futures.ThreadPoolExecutor(10) as pool:
+        responses = list(pool.map(
+            lambda _: webapp.app.test_client().get('/users', buffered=True), range(10)
+        ))
+
+    assert len(queries) == 1
+    assert sorted(r.headers['X-Cache'] for r in responses) == ['coalesced'] * 9 + ['miss']
+    assert len({r.get_data() for r in responses}) == 1